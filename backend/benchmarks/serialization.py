@@ -0,0 +1,88 @@
+"""
+Compares the two ways a list endpoint can serialize rows:
+
+* model: ORM objects validated into the response model with
+  `from_attributes`, dumped to JSON-compatible data and encoded with the
+  standard library, which is what FastAPI does with a `response_model`;
+* fast: column tuples selected straight into dicts and encoded with orjson,
+  which is what GET /users and GET /posts do now.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+import ulid
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from ..core.serialization import dumps, rows_to_dicts, schema_columns
+from ..db.database import Base
+from ..db.engine import create_async_db_engine
+from ..db import models
+from ..schemas.posts import PostResponse
+from ..schemas.users import UserResponse
+
+def _prepare(path: Path, rows: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"uid": str(ulid.new()), "username": f"user{i}", "email": f"user{i}@example.com"}
+            for i in range(rows)
+        ])
+        conn.execute(models.Post.__table__.insert(), [
+            {"pid": str(ulid.new()), "user_id": i % rows + 1, "text": f"post {i}",
+             "title": "A title", "description": "A description", "image_url": None}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+async def _model_path(db, model, schema) -> bytes:
+    adapter = TypeAdapter(List[schema])
+    objects = list((await db.execute(select(model))).scalars())
+    validated = adapter.validate_python(objects, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+async def _fast_path(db, model, schema) -> bytes:
+    columns = schema_columns(schema, model, exclude=("author",))
+    return dumps(rows_to_dicts(await db.execute(select(*columns))))
+
+async def _time(sessionmaker, path, model, schema, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with sessionmaker() as db:
+            start = time.perf_counter()
+            await path(db, model, schema)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+async def main(args):
+    """Times both paths for the users and posts tables."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "serialization.db"
+        _prepare(path, args.rows)
+        engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+        for name, model, schema in (("users", models.User, UserResponse),
+                                    ("posts", models.Post, PostResponse)):
+            model_time = await _time(sessionmaker, _model_path, model, schema, args.repeat)
+            fast_time = await _time(sessionmaker, _fast_path, model, schema, args.repeat)
+            print(f"{name}: model {model_time * 1000:8.1f} ms, fast {fast_time * 1000:8.1f} ms, "
+                  f"speedup {model_time / fast_time:.2f}x ({args.rows} rows)")
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per path; the median is shown")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Compares feed throughput under a mixed read/write load with SQLAlchemy's
+default SQLite engine and with the tuned profile from db/engine.py.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.sqlite_engine_profile --duration 10 --concurrency 32
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+import ulid
+from sqlalchemy import create_engine, desc, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from ..db.database import Base
+from ..db.engine import create_async_db_engine
+from ..db import models
+
+def _prepare(path: Path, posts: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(),
+                     [{"uid": "bench", "username": "bench", "email": "bench@example.com"}])
+        conn.execute(models.Post.__table__.insert(), [
+            {"pid": str(ulid.new()), "user_id": 1, "text": f"post {i}"} for i in range(posts)
+        ])
+    engine.dispose()
+
+async def _worker(sessionmaker, deadline: float, write_ratio: float, stats: dict):
+    while time.perf_counter() < deadline:
+        try:
+            async with sessionmaker() as db:
+                if random.random() < write_ratio:
+                    db.add(models.Post(pid=str(ulid.new()), user_id=1, text="benchmark"))
+                    await db.commit()
+                    stats["writes"] += 1
+                else:
+                    await db.execute(select(models.Post)
+                                     .order_by(desc(models.Post.date_created)).limit(20))
+                    stats["reads"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+async def _run(name: str, engine, args) -> dict:
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(
+        _worker(sessionmaker, deadline, args.write_ratio, stats)
+        for _ in range(args.concurrency)
+    ))
+    await engine.dispose()
+    total = stats["reads"] + stats["writes"]
+    print(f"{name:>8}: {total / args.duration:9.1f} ops/s "
+          f"({stats['reads'] / args.duration:.1f} reads/s, "
+          f"{stats['writes'] / args.duration:.1f} writes/s, {stats['errors']} errors)")
+    return stats
+
+async def main(args):
+    """Runs the benchmark once per engine profile on a fresh database file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        default_path = Path(tmp) / "default.db"
+        tuned_path = Path(tmp) / "tuned.db"
+        _prepare(default_path, args.posts)
+        _prepare(tuned_path, args.posts)
+
+        default = await _run("default", create_async_engine(
+            f"sqlite+aiosqlite:///{default_path}"), args)
+        tuned = await _run("tuned", create_async_db_engine(
+            f"sqlite+aiosqlite:///{tuned_path}"), args)
+
+    base = default["reads"] + default["writes"]
+    if base:
+        print(f"speedup: {(tuned['reads'] + tuned['writes']) / base:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per profile")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent sessions")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of writes")
+    parser.add_argument("--posts", type=int, default=10000, help="rows seeded before the run")
+    asyncio.run(main(parser.parse_args()))
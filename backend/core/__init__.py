@@ -1,3 +1 @@
 from .config import setup_cors, initialize_firebase
-
-initialize_firebase()
@@ -1,12 +1,12 @@
 import os
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
-from firebase_admin import auth as firebase_auth
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from dotenv import load_dotenv
+from .password_hasher import password_hasher, pwd_context # pylint: disable=W0611
+from .firebase_tokens import InvalidFirebaseToken, firebase_token_verifier
 
 env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(env_path)
@@ -16,28 +16,37 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")  # Default to HS256 if not set
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def hash_password(password: str) -> str:
-    """Hashes a password using bcrypt."""
-    return pwd_context.hash(password)
+    """Hashes a password using bcrypt, in the password hashing process pool."""
+    return password_hasher.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plaintext password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verifies a plaintext password against a hashed password, in the process pool."""
+    return password_hasher.verify(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Hashes a password using bcrypt without blocking the event loop."""
+    return await password_hasher.hash_async(password)
 
-def verify_firebase_token(token: str) -> dict:
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plaintext password without blocking the event loop."""
+    return await password_hasher.verify_async(plain_password, hashed_password)
+
+async def verify_firebase_token(token: str) -> dict:
     """Verifies a Firebase token and returns the decoded data.
+
+    Verification is local, against the prefetched Firebase signing keys, and
+    verified tokens are cached until they expire.
     
     Raises:
         HTTPException: If the token is invalid.
     """
     try:
-        decoded_token = firebase_auth.verify_id_token(token)
+        decoded_token = await firebase_token_verifier.verify(token)
         return decoded_token  # Contains 'uid', 'email', 'name', 'picture', etc.
-    except Exception as exc:
+    except InvalidFirebaseToken as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
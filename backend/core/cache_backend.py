@@ -0,0 +1,124 @@
+import math
+import os
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+from cachetools import TLRUCache
+
+class MemoryCacheBackend:
+    """
+    Cache backend local to this process: an LRU of byte values with
+    per-key expiry, plus counters that are never evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._values = TLRUCache(maxsize=maxsize, ttu=self._expires_at, timer=time.monotonic)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expires_at(_key, value, now):
+        ttl = value[1]
+        return now + ttl if ttl else math.inf
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns a value, or None if it is missing or expired."""
+        return (await self.mget(key))[0]
+
+    async def mget(self, *keys: str) -> List[Optional[bytes]]:
+        """Returns several values (or counters) at once, None for missing ones."""
+        with self._lock:
+            values = []
+            for key in keys:
+                if key in self._counters:
+                    values.append(str(self._counters[key]).encode())
+                else:
+                    entry = self._values.get(key)
+                    values.append(entry[0] if entry else None)
+            return values
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Stores a value, expiring after `ttl` seconds if given."""
+        with self._lock:
+            self._values[key] = (value, ttl)
+
+    async def set_if_absent(self, key: str, value: bytes) -> bool:
+        """Stores a value unless the key exists; returns whether it was stored."""
+        with self._lock:
+            if self._values.get(key) is not None:
+                return False
+            self._values[key] = (value, None)
+            return True
+
+    async def incr(self, key: str) -> int:
+        """Increments a counter, starting from 0, and returns its new value."""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def close(self):
+        """Nothing to release for an in-process backend."""
+
+class RedisCacheBackend:
+    """
+    Cache backend on a Redis-compatible server, shared by every worker that
+    points at it. Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis # pylint: disable=C0415
+        except ImportError as exc:
+            raise RuntimeError(
+                f"CACHE_BACKEND_URL={url} requires the 'redis' package (pip install redis)."
+            ) from exc
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns a value, or None if it is missing or expired."""
+        return await self._client.get(key)
+
+    async def mget(self, *keys: str) -> List[Optional[bytes]]:
+        """Returns several values (or counters) at once, None for missing ones."""
+        return await self._client.mget(keys)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Stores a value, expiring after `ttl` seconds if given."""
+        await self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def set_if_absent(self, key: str, value: bytes) -> bool:
+        """Stores a value unless the key exists; returns whether it was stored."""
+        return bool(await self._client.set(key, value, nx=True))
+
+    async def incr(self, key: str) -> int:
+        """Increments a counter, starting from 0, and returns its new value."""
+        return await self._client.incr(key)
+
+    async def close(self):
+        """Closes the connection pool."""
+        await self._client.aclose()
+
+def create_cache_backend(url: Optional[str]):
+    """
+    Creates the cache backend for a URL.
+
+    Args:
+        url (str, optional): "memory://" (or empty) for the in-process
+            backend, or a "redis://" / "rediss://" / "unix://" URL.
+
+    Returns:
+        MemoryCacheBackend or RedisCacheBackend: The backend.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    scheme = urlparse(url).scheme if url else "memory"
+    if scheme == "memory":
+        return MemoryCacheBackend(maxsize=int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "1024")))
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unsupported CACHE_BACKEND_URL scheme: {scheme}")
+
+# Shared by the feed cache and the table change versions
+cache_backend = create_cache_backend(os.getenv("CACHE_BACKEND_URL"))
@@ -0,0 +1,86 @@
+import hashlib
+import secrets
+from typing import Optional, Tuple
+from fastapi import Request, Response, status
+from .cache_backend import cache_backend
+
+class ChangeVersions:
+    """
+    Per-table change counters used to derive ETags.
+
+    Every write to a table bumps its counter, so a response derived from a
+    set of tables is unchanged for as long as their counters are. The
+    counters live in the cache backend, so workers sharing a backend agree
+    on them. An epoch stored next to them keeps ETags issued before the
+    counters were lost (a restart of an in-memory backend, a flushed
+    server) from matching the reset counters.
+    """
+
+    EPOCH_KEY = "versions:epoch"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def bump(self, *tables: str):
+        """Records a change to the given tables."""
+        for table in tables:
+            await self.backend.incr(f"versions:{table}")
+
+    async def tag(self, *tables: str) -> str:
+        """
+        Returns a string identifying the current state of the given tables.
+
+        Read it before querying the tables: writes bump their version after
+        committing, so data read afterwards from the primary is at least as
+        new as the tag. A replica may still lag behind it.
+        """
+        epoch, *versions = await self.backend.mget(
+            self.EPOCH_KEY, *(f"versions:{table}" for table in tables))
+        if epoch is None:
+            await self.backend.set_if_absent(self.EPOCH_KEY, secrets.token_hex(4).encode())
+            epoch = await self.backend.get(self.EPOCH_KEY)
+        return epoch.decode() + "-" + ".".join(
+            version.decode() if version else "0" for version in versions)
+
+change_versions = ChangeVersions(cache_backend)
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" match
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque
+               for candidate in if_none_match.split(","))
+
+def check_not_modified(request: Request, tag: str, variant: Optional[str] = None,
+                       fresh: bool = True) -> Tuple[Optional[Response], dict]:
+    """
+    Answers a conditional read from the table versions alone, before any query runs.
+
+    Args:
+        request (Request): The incoming request.
+        tag (str): The `change_versions.tag()` of the tables the response is derived from.
+        variant (str, optional): What else the response depends on, e.g. a
+            request body; defaults to the query string.
+        fresh (bool): Whether the response will be read from the primary,
+            i.e. is at least as new as the tag. Otherwise no ETag is sent,
+            so a client never keeps a lagging replica's data under the
+            current tag. A matching If-None-Match is still answered, since
+            only fresh responses carry ETags.
+
+    Returns:
+        Tuple[Optional[Response], dict]: A 304 response if the client's
+        `If-None-Match` still matches, else None; and the validator headers
+        to send with the full response.
+    """
+    digest = hashlib.sha1(
+        (request.url.query if variant is None else variant).encode()).hexdigest()[:16]
+    etag = f'W/"{tag}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if fresh else \
+        {"Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers={**headers, "ETag": etag}), headers
+    return None, headers
@@ -1,10 +1,15 @@
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
-from firebase_admin import credentials, initialize_app
+from firebase_admin import credentials, get_app, initialize_app
 
 def initialize_firebase():
-    """Initializes Firebase application with credentials."""
+    """Initializes Firebase application with credentials, once per process."""
+    try:
+        get_app()
+        return
+    except ValueError:
+        pass
     base_path = Path(__file__).resolve().parent.parent  # Get the base directory
     secret_path = base_path / "secrets/firebaseAccountKey.json"
     cred = credentials.Certificate(secret_path)
@@ -0,0 +1,54 @@
+import os
+from typing import Optional
+from .cache_backend import cache_backend
+from .metrics import metrics
+
+class FeedCache:
+    """
+    Pre-encoded JSON bodies of the feed's first page, one per page size and
+    author flag.
+
+    Each body is stored with the version tag it was rendered at (see
+    `ChangeVersions.tag`). A body whose tag is no longer current is stale and
+    never served; writers re-render the default pages right after changing
+    the posts (write-through), so readers mostly find a current body.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def key(limit: int, include_author: bool) -> str:
+        """Returns the backend key of a first page."""
+        return f"feed:first:{limit}:{int(include_author)}"
+
+    async def get(self, limit: int, include_author: bool, tag: str) -> Optional[bytes]:
+        """
+        Returns the cached body of a first page if it was rendered at `tag`.
+
+        Args:
+            limit (int): The page size.
+            include_author (bool): Whether the page embeds authors.
+            tag (str): The current version tag of the tables the page reads.
+
+        Returns:
+            bytes or None: The JSON body, or None on a miss or a stale entry.
+        """
+        entry = await self.backend.get(self.key(limit, include_author))
+        if entry is None:
+            metrics.incr("feed_cache.miss")
+            return None
+        entry_tag, _, body = entry.partition(b"\n")
+        if entry_tag.decode() != tag:
+            metrics.incr("feed_cache.stale")
+            return None
+        metrics.incr("feed_cache.hit")
+        return body
+
+    async def put(self, limit: int, include_author: bool, tag: str, body: bytes):
+        """Stores the body of a first page rendered at `tag`."""
+        await self.backend.set(self.key(limit, include_author),
+                               tag.encode() + b"\n" + body, ttl=self.ttl)
+
+feed_cache = FeedCache(cache_backend, ttl=float(os.getenv("FEED_CACHE_TTL_SECONDS", "300")))
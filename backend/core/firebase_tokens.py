@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+from cachetools import TLRUCache
+from firebase_admin import get_app
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt as google_jwt
+from .http import http_client
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_CERTS_URL = os.getenv(
+    "FIREBASE_CERTS_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com",
+)
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
+FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+FIREBASE_KEYS_MIN_REFRESH_SECONDS = float(os.getenv("FIREBASE_KEYS_MIN_REFRESH_SECONDS", "60"))
+FIREBASE_KEYS_DEFAULT_MAX_AGE_SECONDS = 3600
+FIREBASE_CLOCK_SKEW_SECONDS = 5
+
+class InvalidFirebaseToken(Exception):
+    """Raised when a Firebase ID token fails verification."""
+
+class SigningKeys:
+    """
+    The X.509 certificates Firebase signs ID tokens with, keyed by key id.
+
+    `start` fetches them once and then keeps them fresh from a background
+    task, honouring the max-age Google publishes, so token verification never
+    waits on the network. `set_certs` installs a static key set instead,
+    e.g. a local stand-in for tests.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.certs: Dict[str, str] = {}
+        self._last_fetch = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    def set_certs(self, certs: Dict[str, str]):
+        """Replaces the key set with the given key id -> PEM certificate mapping."""
+        self.certs = dict(certs)
+        self._last_fetch = time.monotonic()
+
+    async def start(self):
+        """Fetches the key set and schedules background refreshes."""
+        self._refresh_lock = asyncio.Lock()
+        max_age = await self._refresh_safely()
+        self._task = asyncio.create_task(self._refresh_loop(max_age), name="firebase-keys")
+
+    async def stop(self):
+        """Cancels the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh_if_stale(self):
+        """
+        Refetches the key set on demand, e.g. when a token names an unknown key
+        id. Rate limited to one fetch per FIREBASE_KEYS_MIN_REFRESH_SECONDS.
+        """
+        if self._refresh_lock is None:
+            return
+        async with self._refresh_lock:
+            if time.monotonic() - self._last_fetch >= FIREBASE_KEYS_MIN_REFRESH_SECONDS:
+                await self._refresh_safely()
+
+    async def _refresh_loop(self, max_age: float):
+        while True:
+            await asyncio.sleep(max_age)
+            async with self._refresh_lock:
+                max_age = await self._refresh_safely()
+
+    async def _refresh_safely(self) -> float:
+        try:
+            return await self._fetch()
+        except Exception as exc: # pylint: disable=W0718
+            logger.error("Failed to fetch Firebase signing keys: %s", exc)
+            return FIREBASE_KEYS_MIN_REFRESH_SECONDS
+
+    async def _fetch(self) -> float:
+        async with http_client.session.get(self.url) as response:
+            response.raise_for_status()
+            certs = await response.json(content_type=None)
+            cache_control = response.headers.get("Cache-Control", "")
+        self.set_certs(certs)
+        metrics.incr("firebase.keys.refresh")
+        match = re.search(r"max-age=(\d+)", cache_control)
+        max_age = int(match.group(1)) if match else FIREBASE_KEYS_DEFAULT_MAX_AGE_SECONDS
+        return max(max_age, FIREBASE_KEYS_MIN_REFRESH_SECONDS)
+
+class FirebaseTokenVerifier:
+    """
+    Verifies Firebase ID tokens locally against `SigningKeys` and caches the
+    verified claims until the token's own `exp`, so a repeated token costs a
+    dictionary lookup and a new one costs a local signature check.
+    """
+
+    def __init__(self, keys: SigningKeys, project_id: Optional[str], cache_size: int):
+        self.keys = keys
+        self._project_id = project_id
+        self._lock = threading.Lock()
+        self._verified = TLRUCache(maxsize=cache_size, ttu=lambda _k, v, _now: v["exp"],
+                                   timer=time.time)
+
+    @property
+    def project_id(self) -> str:
+        """The Firebase project tokens must be issued for."""
+        if self._project_id is None:
+            self._project_id = get_app().project_id
+        return self._project_id
+
+    async def verify(self, token: str) -> dict:
+        """
+        Verifies a Firebase ID token and returns its claims, with `uid` set.
+
+        Args:
+            token (str): The ID token sent by the client.
+
+        Raises:
+            InvalidFirebaseToken: If the token is malformed, expired, not signed
+                by a current Firebase key, or issued for another project.
+
+        Returns:
+            dict: The verified claims; a copy, so the cached entry is not
+            changed through it.
+        """
+        with self._lock:
+            claims = self._verified.get(token)
+        if claims is not None:
+            metrics.incr("firebase.token.cache_hit")
+            return dict(claims)
+        metrics.incr("firebase.token.cache_miss")
+
+        try:
+            header = google_jwt.decode_header(token)
+        except (ValueError, google_exceptions.GoogleAuthError) as exc:
+            raise InvalidFirebaseToken("Malformed token.") from exc
+        if header.get("alg") != "RS256":
+            raise InvalidFirebaseToken("Unexpected signing algorithm.")
+        if header.get("kid") not in self.keys.certs:
+            await self.keys.refresh_if_stale()
+
+        claims = self._decode(token)
+        with self._lock:
+            self._verified[token] = claims
+        return dict(claims)
+
+    def _decode(self, token: str) -> dict:
+        try:
+            claims = dict(google_jwt.decode(
+                token,
+                certs=self.keys.certs,
+                audience=self.project_id,
+                clock_skew_in_seconds=FIREBASE_CLOCK_SKEW_SECONDS,
+            ))
+        except (ValueError, google_exceptions.GoogleAuthError) as exc:
+            raise InvalidFirebaseToken(str(exc)) from exc
+
+        if claims.get("iss") != f"https://securetoken.google.com/{self.project_id}":
+            raise InvalidFirebaseToken("Unexpected issuer.")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidFirebaseToken("Invalid subject.")
+        if claims.get("auth_time", 0) > time.time() + FIREBASE_CLOCK_SKEW_SECONDS:
+            raise InvalidFirebaseToken("Token authenticated in the future.")
+        claims["uid"] = subject
+        return claims
+
+firebase_signing_keys = SigningKeys(FIREBASE_CERTS_URL)
+firebase_token_verifier = FirebaseTokenVerifier(
+    keys=firebase_signing_keys,
+    project_id=FIREBASE_PROJECT_ID,
+    cache_size=FIREBASE_TOKEN_CACHE_SIZE,
+)
@@ -0,0 +1,65 @@
+import logging
+import os
+from typing import Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "8"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "10"))
+HTTP_TOTAL_TIMEOUT_SECONDS = float(os.getenv("HTTP_TOTAL_TIMEOUT_SECONDS", "30"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+HTTP_USER_AGENT = os.getenv("HTTP_USER_AGENT", "thgirraf/1.0 (+link preview)")
+
+class HttpClient:
+    """
+    The shared outbound HTTP client of the process.
+
+    Wraps a single aiohttp session whose connector keeps connections (and
+    their TLS sessions) alive for reuse, caches DNS lookups, caps the number
+    of open connections globally and per host, and applies connect, read and
+    total timeouts to every request.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Opens the pooled session. Must run on the application's event loop."""
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            use_dns_cache=True,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT_SECONDS,
+            connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+            sock_read=HTTP_READ_TIMEOUT_SECONDS,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"User-Agent": HTTP_USER_AGENT},
+        )
+
+    async def close(self):
+        """Closes the session and all pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled session.
+
+        Raises:
+            RuntimeError: If the client has not been started.
+        """
+        if self._session is None:
+            raise RuntimeError("The HTTP client has not been started.")
+        return self._session
+
+http_client = HttpClient()
@@ -0,0 +1,214 @@
+import asyncio
+import os
+from pathlib import Path, PurePath
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+ICON_DIR = Path(__file__).resolve().parent.parent / "static/icons"
+
+# Stored icons never change: a new image gets a new name
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Icons whose content can change under the same name
+MUTABLE_ICONS = {"default.png"}
+MUTABLE_CACHE_CONTROL = "public, max-age=3600"
+
+class IconFileResponse(FileResponse):
+    """
+    A file response that lets the server send the file itself (zero-copy)
+    when it supports the ASGI `http.response.pathsend` extension, instead
+    of reading it in chunks on the event loop.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if ("http.response.pathsend" not in scope.get("extensions", {})
+                or scope["method"] != "GET" or Headers(scope=scope).get("range")):
+            await super().__call__(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code,
+                    "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": str(self.path)})
+        if self.background is not None:
+            await self.background()
+
+class IconStaticFiles(StaticFiles):
+    """
+    Serves the local icon directory with long-lived cache headers.
+
+    Every icon but the default one is named uniquely per image, so it is
+    served as immutable for a year with its name as a strong ETag: browsers
+    reuse it without revalidating, and a conditional request whose ETag
+    matches the name is answered with a 304 before the file is looked up.
+    """
+
+    @staticmethod
+    def _headers(path: str) -> Dict[str, str]:
+        name = PurePath(path).name
+        if name in MUTABLE_ICONS:
+            return {"Cache-Control": MUTABLE_CACHE_CONTROL}
+        return {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": f'"{PurePath(name).stem}"'}
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        headers = self._headers(path)
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if ("ETag" in headers and if_none_match and scope["method"] in ("GET", "HEAD")
+                and headers["ETag"] in (tag.strip().removeprefix("W/")
+                                        for tag in if_none_match.split(","))):
+            return NotModifiedResponse(Headers(headers))
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        response = IconFileResponse(full_path, status_code=status_code,
+                                    headers=self._headers(str(full_path)),
+                                    stat_result=stat_result)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+class LocalIconStorage:
+    """
+    Icon files in a local directory, served by the app under /icons.
+
+    Files are written under a temporary name and renamed into place, so a
+    reader never sees a partial file. Names are relative to the directory;
+    a name that resolves outside of it is rejected.
+    """
+
+    def __init__(self, root: Path, base_url: str = "/icons"):
+        self.root = root.resolve()
+        self.base_url = base_url
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def exists(self, name: str) -> bool:
+        """Returns whether a file is stored."""
+        return await asyncio.to_thread(lambda: self._path(name).is_file())
+
+    async def write(self, files: Dict[str, bytes]):
+        """Stores files, in order, replacing any existing file of the same name."""
+        await asyncio.to_thread(self._write, files)
+
+    async def delete(self, names: List[str]):
+        """Deletes files, ignoring missing ones."""
+        await asyncio.to_thread(self._delete, names)
+
+    def url(self, name: str) -> str:
+        """Returns the URL a file is served at."""
+        return f"{self.base_url}/{name}"
+
+    def _path(self, name: str) -> Path:
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root) or path == self.root:
+            raise ValueError(f"Icon name outside of the icon directory: {name!r}")
+        return path
+
+    def _write(self, files: Dict[str, bytes]):
+        for name, data in files.items():
+            path = self._path(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_name(f".{path.name}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, path)
+
+    def _delete(self, names: List[str]):
+        for name in names:
+            try:
+                self._path(name).unlink()
+            except FileNotFoundError:
+                pass
+
+class S3IconStorage:
+    """
+    Icon files in an S3-compatible bucket (AWS S3, MinIO, ...), served from
+    the bucket or a CDN in front of it. `boto3` is only imported when this
+    storage is configured; its blocking calls run in worker threads.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 public_url: Optional[str] = None):
+        try:
+            import boto3 # pylint: disable=C0415
+            from botocore.exceptions import ClientError # pylint: disable=C0415
+        except ImportError as exc:
+            raise RuntimeError(
+                "S3 icon storage requires the 'boto3' package (pip install boto3)."
+            ) from exc
+        self.bucket = bucket
+        self.prefix = prefix
+        if public_url is None:
+            public_url = (f"{endpoint_url.rstrip('/')}/{bucket}" if endpoint_url
+                          else f"https://{bucket}.s3.amazonaws.com")
+        self.public_url = public_url.rstrip("/")
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+
+    async def exists(self, name: str) -> bool:
+        """Returns whether an object is stored."""
+        try:
+            await asyncio.to_thread(self._client.head_object,
+                                    Bucket=self.bucket, Key=self.prefix + name)
+            return True
+        except self._client_error as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def write(self, files: Dict[str, bytes]):
+        """Stores objects, in order, replacing any existing object of the same name."""
+        for name, data in files.items():
+            await asyncio.to_thread(
+                self._client.put_object, Bucket=self.bucket, Key=self.prefix + name,
+                Body=data, ContentType="image/webp", CacheControl=IMMUTABLE_CACHE_CONTROL,
+            )
+
+    async def delete(self, names: List[str]):
+        """Deletes objects, ignoring missing ones."""
+        if names:
+            await asyncio.to_thread(
+                self._client.delete_objects, Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self.prefix + name} for name in names],
+                        "Quiet": True},
+            )
+
+    def url(self, name: str) -> str:
+        """Returns the URL an object is served at."""
+        return f"{self.public_url}/{self.prefix}{name}"
+
+def create_icon_storage(url: Optional[str]):
+    """
+    Creates the icon storage for a URL.
+
+    Args:
+        url (str, optional): Empty for the app's static/icons directory, or
+            "s3://bucket/prefix". For S3, ICON_S3_ENDPOINT_URL points at a
+            non-AWS server and ICON_PUBLIC_BASE_URL overrides the URL icons
+            are served from.
+
+    Returns:
+        LocalIconStorage or S3IconStorage: The storage.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    parsed = urlparse(url or "")
+    if not parsed.scheme:
+        return LocalIconStorage(ICON_DIR)
+    if parsed.scheme == "s3":
+        prefix = parsed.path.strip("/")
+        return S3IconStorage(
+            bucket=parsed.netloc,
+            prefix=f"{prefix}/" if prefix else "",
+            endpoint_url=os.getenv("ICON_S3_ENDPOINT_URL"),
+            public_url=os.getenv("ICON_PUBLIC_BASE_URL"),
+        )
+    raise ValueError(f"Unsupported ICON_STORAGE_URL scheme: {parsed.scheme}")
+
+icon_storage = create_icon_storage(os.getenv("ICON_STORAGE_URL"))
+# Icons stored before content addressing are in the app's directory, whatever
+# ICON_STORAGE_URL says (see core.icons.blob_hash)
+local_icon_storage = icon_storage if isinstance(icon_storage, LocalIconStorage) \
+    else LocalIconStorage(ICON_DIR)
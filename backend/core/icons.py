@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Sequence
+from fastapi import HTTPException, status
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .icon_storage import icon_storage, local_icon_storage
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Square WebP variants rendered for every icon; the largest one is stored in User.icon
+ICON_SIZES = tuple(sorted(
+    int(size) for size in os.getenv("ICON_SIZES", "48,96,256").split(",")
+))
+ICON_WEBP_QUALITY = int(os.getenv("ICON_WEBP_QUALITY", "80"))
+# Largest upload or download accepted, before decoding
+ICON_MAX_BYTES = int(os.getenv("ICON_MAX_BYTES", str(5 * 1024 * 1024)))
+# Larger images are rejected before being decoded (decompression bombs),
+# from the dimensions in their header
+ICON_MAX_PIXELS = int(os.getenv("ICON_MAX_PIXELS", str(40_000_000)))
+ICON_PROCESS_WORKERS = int(os.getenv("ICON_PROCESS_WORKERS", "2"))
+ICON_PROCESS_MAX_PENDING = int(os.getenv("ICON_PROCESS_MAX_PENDING", "16"))
+ICON_PROCESS_TIMEOUT_SECONDS = float(os.getenv("ICON_PROCESS_TIMEOUT_SECONDS", "20"))
+
+# Accepted source formats by their leading bytes, as Pillow format names
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+)
+ICON_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+
+class InvalidImage(ValueError):
+    """Raised when uploaded bytes cannot be decoded as a supported image."""
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """
+    Identifies an image from its first bytes, whatever its declared type.
+
+    Args:
+        head (bytes): At least the first 12 bytes of the file.
+
+    Returns:
+        str or None: The Pillow format name, or None if it is not an
+        accepted image format.
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+def render_variants(data: bytes, sizes: Sequence[int], quality: int,
+                    max_pixels: int) -> Dict[int, bytes]:
+    """
+    Decodes an image and renders it as square WebP icons, one per size.
+
+    EXIF orientation is applied first; no metadata (EXIF, ICC, XMP) is
+    carried over to the variants. Runs in a worker process.
+
+    Args:
+        data (bytes): The encoded source image.
+        sizes (Sequence[int]): The edge lengths to render, in pixels.
+        quality (int): The WebP quality.
+        max_pixels (int): The largest source image accepted.
+
+    Raises:
+        InvalidImage: If the data is not a decodable image or is too large.
+
+    Returns:
+        Dict[int, bytes]: The encoded WebP variant of each size.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(BytesIO(data), formats=ICON_FORMATS) as source:
+            # Pillow only refuses images over twice its limit; below that it just warns
+            width, height = source.size
+            if width * height > max_pixels:
+                raise InvalidImage(
+                    f"Image of {width}x{height} pixels exceeds the limit of {max_pixels} pixels."
+                )
+            # Lets JPEG decode straight at a reduced scale
+            source.draft("RGB", (max(sizes), max(sizes)))
+            image = ImageOps.exif_transpose(source)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise InvalidImage(str(exc)) from exc
+
+    variants = {}
+    for size in sorted(sizes, reverse=True):
+        variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, "WEBP", quality=quality, method=4)
+        variants[size] = buffer.getvalue()
+    return variants
+
+def server_busy() -> HTTPException:
+    """Returns the 503 error raised when icons cannot be processed right now."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={
+            "code": "SRV_003",
+            "message": "The server is busy. Please try again shortly."
+        },
+        headers={"Retry-After": "1"},
+    )
+
+class IconProcessor:
+    """
+    Renders icon variants in a dedicated process pool, off the event loop and
+    outside the web worker's GIL. At most `max_pending` images are queued or
+    processing at once; further calls are rejected with a 503.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def render(self, data: bytes) -> Dict[int, bytes]:
+        """
+        Renders the variants of an image without blocking the event loop.
+
+        Raises:
+            InvalidImage: If the data is not a decodable image.
+            HTTPException: 503 error if the pool is saturated or too slow.
+        """
+        if not self._slots.acquire(blocking=False):
+            metrics.incr("icons.render.rejected")
+            raise server_busy()
+        try:
+            future = self._pool().submit(render_variants, data, ICON_SIZES,
+                                         ICON_WEBP_QUALITY, ICON_MAX_PIXELS)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the worker is done, even if the caller gave up
+        future.add_done_callback(lambda _: self._slots.release())
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError as exc:
+            metrics.incr("icons.render.timeout")
+            raise server_busy() from exc
+        finally:
+            metrics.observe("icons.render_seconds", time.perf_counter() - started)
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+icon_processor = IconProcessor(
+    workers=ICON_PROCESS_WORKERS,
+    max_pending=ICON_PROCESS_MAX_PENDING,
+    timeout=ICON_PROCESS_TIMEOUT_SECONDS,
+)
+
+def _variant_suffix(size: int) -> str:
+    return f"-{size}.webp"
+
+def content_hash(data: bytes) -> str:
+    """
+    Returns the name of the icon an image renders to: the SHA-256 of the
+    image and of the render settings, so changing the settings re-renders.
+    """
+    settings = f"{','.join(map(str, ICON_SIZES))}:{ICON_WEBP_QUALITY}\n".encode()
+    return hashlib.sha256(settings + data).hexdigest()
+
+def blob_files(digest: str) -> List[str]:
+    """
+    Returns the files of a content-addressed icon, smallest first, sharded
+    as `ab/cd/abcd...-{size}.webp` so no directory grows too large.
+    """
+    return [f"{digest[:2]}/{digest[2:4]}/{digest}{_variant_suffix(size)}"
+            for size in ICON_SIZES]
+
+def blob_hash(icon: str) -> Optional[str]:
+    """Returns the content hash of an icon, or None for icons stored before hashing."""
+    suffix = _variant_suffix(ICON_SIZES[-1])
+    shard, _, name = icon.rpartition("/")
+    digest = name.removesuffix(suffix)
+    if name.endswith(suffix) and len(digest) == 64 and shard == f"{digest[:2]}/{digest[2:4]}":
+        return digest
+    return None
+
+def icon_files(icon: str) -> List[str]:
+    """
+    Returns the files of an icon: every variant, or the icon itself for
+    icons stored before variants existed.
+    """
+    suffix = _variant_suffix(ICON_SIZES[-1])
+    if not icon.endswith(suffix):
+        return [icon]
+    stem = icon[:-len(suffix)]
+    return [stem + _variant_suffix(size) for size in ICON_SIZES]
+
+def icon_variants(icon: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Returns the URL of each variant of an icon, keyed by edge length.
+    Icons stored before content addressing are served by the app.
+
+    Args:
+        icon (str, optional): The value of User.icon.
+
+    Returns:
+        Dict[str, str] or None: e.g. {"48": "/icons/ab/cd/abcd...-48.webp", ...},
+        or None if the user has no icon.
+    """
+    if not icon:
+        return None
+    storage = icon_storage if blob_hash(icon) else local_icon_storage
+    files = icon_files(icon)
+    if len(files) == 1:
+        return {str(size): storage.url(icon) for size in ICON_SIZES}
+    return {str(size): storage.url(name) for size, name in zip(ICON_SIZES, files)}
+
+def with_icon_variants(row: dict, icon_key: str = "icon") -> dict:
+    """Adds the `icon_variants` of a fast-path row in place and returns it."""
+    row["icon_variants"] = icon_variants(row[icon_key])
+    return row
+
+async def write_variants(digest: str, data: bytes):
+    """
+    Renders an image's variants and stores them under its content hash.
+
+    The largest variant is written last, so its presence means the icon is
+    complete.
+
+    Raises:
+        InvalidImage: If the data is not a decodable image.
+    """
+    variants = await icon_processor.render(data)
+    files = dict(zip(blob_files(digest), (variants[size] for size in ICON_SIZES)))
+    await icon_storage.write(files)
+    metrics.incr("icons.saved")
+    metrics.observe("icons.saved_bytes", sum(len(variant) for variant in variants.values()))
@@ -0,0 +1,132 @@
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Job:
+    """A unit of background work and its retry state."""
+    func: Callable
+    args: Tuple[Any, ...] = ()
+    on_failure: Optional[Callable] = None
+    attempt: int = field(default=1)
+    # Set for coalesced jobs until they start running
+    key: Optional[Tuple[Any, ...]] = None
+
+class JobQueue:
+    """
+    A pool of asyncio workers that run background jobs with retries.
+
+    Jobs may be plain or async callables; plain callables run in a worker
+    thread so they never block the event loop. A job that raises is retried
+    with exponential backoff until `max_attempts` is reached, after which its
+    `on_failure` callback (if any) is invoked with the job arguments.
+    """
+
+    def __init__(self, name: str, workers: int = 4,
+                 max_attempts: int = 3, backoff: float = 1.0):
+        self.name = name
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._queued_keys = set()
+
+    @property
+    def running(self) -> bool:
+        """Whether the workers have been started."""
+        return self._loop is not None
+
+    async def start(self):
+        """Starts the worker tasks on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Started %d %s workers.", self.workers, self.name)
+
+    async def stop(self):
+        """Cancels the worker tasks. Queued jobs are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._queue = None
+        self._queued_keys.clear()
+
+    def submit(self, func: Callable, *args: Any, on_failure: Optional[Callable] = None,
+               coalesce: bool = False):
+        """
+        Enqueues a job. Safe to call from the event loop or from a worker thread.
+
+        Args:
+            func (Callable): The job to run.
+            *args: The arguments passed to the job.
+            on_failure (Callable, optional): Called with `*args` once all attempts failed.
+            coalesce (bool): Skip the job if the same call is already queued and
+                has not started yet; that run covers both submissions. Only
+                coalesce from the event loop.
+        """
+        if not self.running:
+            logger.warning("%s queue is not running; dropping job %s.", self.name, func.__name__)
+            return
+        key = (func, *args) if coalesce else None
+        if key is not None:
+            if key in self._queued_keys:
+                return
+            self._queued_keys.add(key)
+        self._enqueue(Job(func=func, args=args, on_failure=on_failure, key=key))
+
+    def _enqueue(self, job: Job):
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            if job.key is not None:
+                self._queued_keys.discard(job.key)
+                job.key = None
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                await job.func(*job.args)
+            else:
+                await asyncio.to_thread(job.func, *job.args)
+        except Exception as exc: # pylint: disable=W0718
+            if job.attempt < self.max_attempts:
+                delay = self.backoff * 2 ** (job.attempt - 1)
+                logger.warning("%s job %s failed (attempt %d/%d), retrying in %.1fs: %s",
+                               self.name, job.func.__name__, job.attempt,
+                               self.max_attempts, delay, exc)
+                job.attempt += 1
+                self._loop.call_later(delay, self._enqueue, job)
+                return
+            logger.error("%s job %s failed after %d attempts: %s",
+                         self.name, job.func.__name__, job.attempt, exc)
+            if job.on_failure:
+                await self._run_failure_callback(job)
+
+    async def _run_failure_callback(self, job: Job):
+        try:
+            if inspect.iscoroutinefunction(job.on_failure):
+                await job.on_failure(*job.args)
+            else:
+                await asyncio.to_thread(job.on_failure, *job.args)
+        except Exception as exc: # pylint: disable=W0718
+            logger.error("%s failure callback for %s raised: %s",
+                         self.name, job.func.__name__, exc)
@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from cachetools import TLRUCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from .metrics import metrics
+from ..db import models
+
+logger = logging.getLogger(__name__)
+
+LINK_PREVIEW_CACHE_SIZE = int(os.getenv("LINK_PREVIEW_CACHE_SIZE", "10000"))
+LINK_PREVIEW_TTL_SECONDS = int(os.getenv("LINK_PREVIEW_TTL_SECONDS", str(7 * 24 * 3600)))
+LINK_PREVIEW_NEGATIVE_TTL_SECONDS = int(os.getenv("LINK_PREVIEW_NEGATIVE_TTL_SECONDS", "3600"))
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid"}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that trivially different spellings share a cache entry.
+
+    Lowercases the scheme and host, drops default ports, credentials, the
+    fragment and tracking parameters, and sorts the remaining query parameters.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and DEFAULT_PORTS.get(scheme) != parts.port:
+        netloc = f"{netloc}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+class CachedMetadata:
+    """A cached lookup result. `metadata` is None for a cached failure."""
+    __slots__ = ("metadata", "expires_at")
+
+    def __init__(self, metadata: Optional[dict], expires_at: float):
+        self.metadata = metadata
+        self.expires_at = expires_at
+
+class MetadataCache:
+    """
+    Two-tier cache of link preview metadata keyed by normalized URL.
+
+    The first tier is an in-process LRU; the second is the `link_previews`
+    table, which survives restarts and is shared by all workers. Successful
+    fetches are kept for `ttl` seconds, failures for `negative_ttl` seconds so
+    dead links are not fetched again on every post.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, negative_ttl: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._memory = TLRUCache(maxsize=maxsize, ttu=lambda _k, v, _now: v.expires_at,
+                                 timer=time.time)
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Returns the cache key of a URL."""
+        return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+    def peek(self, url: str) -> Optional[CachedMetadata]:
+        """
+        Looks a URL up in the in-process tier only. Never touches the database.
+
+        Args:
+            url (str): The URL to look up.
+
+        Returns:
+            CachedMetadata or None: The cached result, or None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(self.key(url))
+        metrics.incr("link_preview.cache.memory_hit" if entry else "link_preview.cache.memory_miss")
+        return entry
+
+    async def get(self, db: AsyncSession, url: str) -> Optional[CachedMetadata]:
+        """
+        Looks a URL up in the in-process tier, then in the database.
+
+        Args:
+            db (AsyncSession): The database session.
+            url (str): The URL to look up.
+
+        Returns:
+            CachedMetadata or None: The cached result, or None on a miss.
+        """
+        entry = self.peek(url)
+        if entry:
+            return entry
+
+        key = self.key(url)
+        row = await db.get(models.LinkPreview, key)
+        if row is not None:
+            entry = self._entry_from_row(row)
+            if entry.expires_at > time.time():
+                metrics.incr("link_preview.cache.db_hit")
+                with self._lock:
+                    self._memory[key] = entry
+                return entry
+        metrics.incr("link_preview.cache.miss")
+        return None
+
+    async def store(self, db: AsyncSession, url: str, metadata: Optional[dict]):
+        """
+        Stores a fetch result in both tiers. Pass None to cache a failure.
+
+        Args:
+            db (AsyncSession): The database session.
+            url (str): The URL that was fetched.
+            metadata (dict, optional): The fetched metadata, or None on failure.
+        """
+        key = self.key(url)
+        row = await db.get(models.LinkPreview, key) or models.LinkPreview(key=key)
+        row.url = normalize_url(url)
+        row.ok = metadata is not None
+        row.title = (metadata or {}).get("title")
+        row.description = (metadata or {}).get("description")
+        row.image_url = (metadata or {}).get("image_url")
+        row.fetched_at = datetime.now(timezone.utc)
+        db.add(row)
+        await db.commit()
+        with self._lock:
+            self._memory[key] = self._entry_from_row(row)
+
+    def _entry_from_row(self, row: models.LinkPreview) -> CachedMetadata:
+        fetched_at = row.fetched_at
+        if fetched_at.tzinfo is None:
+            fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+        if row.ok:
+            metadata = {"title": row.title, "description": row.description,
+                        "image_url": row.image_url}
+            expires_at = fetched_at + timedelta(seconds=self.ttl)
+        else:
+            metadata = None
+            expires_at = fetched_at + timedelta(seconds=self.negative_ttl)
+        return CachedMetadata(metadata, expires_at.timestamp())
+
+metadata_cache = MetadataCache(
+    maxsize=LINK_PREVIEW_CACHE_SIZE,
+    ttl=LINK_PREVIEW_TTL_SECONDS,
+    negative_ttl=LINK_PREVIEW_NEGATIVE_TTL_SECONDS,
+)
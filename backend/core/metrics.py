@@ -0,0 +1,38 @@
+import threading
+from collections import defaultdict
+
+class Metrics:
+    """
+    Thread-safe, in-process counters and timing summaries.
+
+    Values are per worker process and reset on restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._summaries = {}
+
+    def incr(self, name: str, value: int = 1):
+        """Increments the counter `name` by `value`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """Records one observation (e.g. a duration in seconds) for `name`."""
+        with self._lock:
+            summary = self._summaries.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["total"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> dict:
+        """Returns a copy of all counters and summaries, with averages."""
+        with self._lock:
+            summaries = {
+                name: {**summary, "avg": summary["total"] / summary["count"]}
+                for name, summary in self._summaries.items()
+            }
+            return {"counters": dict(self._counters), "summaries": summaries}
+
+metrics = Metrics()
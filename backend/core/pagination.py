@@ -0,0 +1,54 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Sequence, Tuple
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque cursor.
+
+    Args:
+        *values: The key values, in sort order. Datetimes are stored as ISO strings.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    encoded = base64.urlsafe_b64encode(json.dumps(raw, separators=(",", ":")).encode())
+    return encoded.rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """
+    Decodes a cursor produced by `encode_cursor` back into typed key values.
+
+    Args:
+        cursor (str): The opaque cursor received from the client.
+        types (Sequence[type]): The expected type of each key value.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+
+    Returns:
+        tuple: The decoded key values.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError("cursor arity mismatch")
+        return tuple(
+            datetime.fromisoformat(value) if expected is datetime else expected(value)
+            for value, expected in zip(raw, types)
+        )
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "code": "PAGE_001",
+                "message": "Invalid pagination cursor."
+            }
+        ) from exc
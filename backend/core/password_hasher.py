@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail={
+            "code": "SRV_003",
+            "message": "The server is busy. Please try again shortly."
+        },
+        headers={"Retry-After": "1"},
+    )
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so it never holds the GIL of the
+    web worker.
+
+    At most `max_pending` calls may be queued or running at once; further
+    calls are rejected immediately with a 503 instead of piling up. Every
+    call's wall time (queueing included) is recorded in the metrics registry.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def hash(self, password: str) -> str:
+        """Hashes a password, blocking the calling thread (not the GIL) until done."""
+        return self._call("hash", _hash, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifies a password, blocking the calling thread (not the GIL) until done."""
+        return self._call("verify", _verify, plain_password, hashed_password)
+
+    async def hash_async(self, password: str) -> str:
+        """Hashes a password without blocking the event loop."""
+        return await self._call_async("hash", _hash, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifies a password without blocking the event loop."""
+        return await self._call_async("verify", _verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _call(self, name: str, func: Callable, *args):
+        started = time.perf_counter()
+        future = self._submit(name, func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as exc:
+            metrics.incr(f"password_hash.{name}.timeout")
+            raise _busy() from exc
+        finally:
+            metrics.observe(f"password_hash.{name}_seconds", time.perf_counter() - started)
+
+    async def _call_async(self, name: str, func: Callable, *args):
+        started = time.perf_counter()
+        future = self._submit(name, func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError as exc:
+            metrics.incr(f"password_hash.{name}.timeout")
+            raise _busy() from exc
+        finally:
+            metrics.observe(f"password_hash.{name}_seconds", time.perf_counter() - started)
+
+    def _submit(self, name: str, func: Callable, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            metrics.incr(f"password_hash.{name}.rejected")
+            logger.warning("Password hashing pool saturated; rejecting %s call.", name)
+            raise _busy()
+        try:
+            future = self._pool().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+    timeout=PASSWORD_HASH_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import logging
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from .metrics import metrics
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Event:
+    """A published event, already encoded as a Server-Sent Events frame."""
+    id: str
+    frame: bytes
+
+# Queue markers delivered to subscribers next to events
+_HEARTBEAT = object()
+_CLOSED = object()
+_RESET = b"event: reset\ndata: {}\n\n"
+
+class Subscription:
+    """One subscriber's bounded queue of pending events."""
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, item) -> bool:
+        """Enqueues an item without waiting; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        """Discards pending events and tells the consumer to stop."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+class EventBus:
+    """
+    In-process publish/subscribe bus for Server-Sent Events.
+
+    Published events are kept in a bounded replay buffer, so a client that
+    reconnects with `Last-Event-ID` receives what it missed. Each subscriber
+    has a bounded queue: a client that falls `queue_size` events behind is
+    disconnected rather than buffered without limit, and resumes from the
+    replay buffer when it reconnects. A single task sends heartbeats to all
+    subscribers, so idle connections cost no timers of their own.
+
+    `publish` must be called from the event loop.
+    """
+
+    def __init__(self, name: str, replay_size: int = 1000,
+                 queue_size: int = 100, heartbeat: float = 15):
+        self.name = name
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._epoch = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        """The number of connected subscribers."""
+        return len(self._subscribers)
+
+    async def start(self):
+        """Starts the heartbeat task."""
+        self._task = asyncio.create_task(self._heartbeat_loop(), name=f"{self.name}-heartbeat")
+
+    async def stop(self):
+        """Stops the heartbeat task and ends every subscription."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+
+    def publish(self, event_type: str, payload) -> Event:
+        """
+        Publishes an event to every subscriber and to the replay buffer.
+
+        Args:
+            event_type (str): The SSE event name, e.g. "post.created".
+            payload: JSON-serializable event data.
+
+        Returns:
+            Event: The published event.
+        """
+        event_id = f"{self._epoch}-{next(self._ids)}"
+        frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            event_id.encode(), event_type.encode(), dumps(payload))
+        event = Event(id=event_id, frame=frame)
+        self._replay.append(event)
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                # Too slow to keep up: disconnect, it resumes from the replay buffer
+                metrics.incr(f"{self.name}.dropped")
+                self._subscribers.discard(subscription)
+                subscription.close()
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Registers a subscriber, queueing the events it missed if it is resuming.
+
+        If `last_event_id` is no longer in the replay buffer (or comes from a
+        previous process), the subscriber first receives a `reset` event and
+        should reload its state.
+
+        Args:
+            last_event_id (str, optional): The `Last-Event-ID` sent by the client.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription(self.queue_size)
+        if last_event_id:
+            missed = self._missed_since(last_event_id)
+            if missed is None or len(missed) >= self.queue_size:
+                subscription.offer(_RESET)
+            else:
+                for event in missed:
+                    subscription.offer(event)
+        self._subscribers.add(subscription)
+        metrics.incr(f"{self.name}.connected")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Removes a subscriber."""
+        self._subscribers.discard(subscription)
+
+    def _missed_since(self, last_event_id: str) -> Optional[list]:
+        events = list(self._replay)
+        for index, event in enumerate(events):
+            if event.id == last_event_id:
+                return events[index + 1:]
+        return None
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscription in list(self._subscribers):
+                subscription.offer(_HEARTBEAT)
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[bytes]:
+        """
+        Yields a subscription's SSE frames until it is closed or the client leaves.
+
+        Args:
+            subscription (Subscription): A subscription from `subscribe`.
+
+        Yields:
+            bytes: SSE frames, heartbeat comments included.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                item = await subscription.queue.get()
+                if item is _CLOSED:
+                    return
+                if item is _HEARTBEAT:
+                    yield b": heartbeat\n\n"
+                elif item is _RESET:
+                    yield _RESET
+                else:
+                    yield item.frame
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,41 @@
+from typing import Iterable, List, Sequence, Type
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+def dumps(content) -> bytes:
+    """Encodes plain data (dicts, lists, datetimes, ...) to JSON bytes with orjson."""
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    The application's default response class: encodes with orjson.
+
+    UTC datetimes are written with a "Z" suffix, as pydantic writes them, so
+    responses look the same whether or not they went through a response model.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def schema_columns(schema: Type[BaseModel], model, exclude: Sequence[str] = ()) -> list:
+    """
+    Returns the model columns backing a response schema's fields, in field order.
+
+    Selecting exactly these columns yields rows whose mappings already have
+    the schema's shape, so they can be encoded without building ORM objects or
+    validating each row.
+
+    Args:
+        schema (Type[BaseModel]): The response schema.
+        model: The ORM model class the fields are read from.
+        exclude (Sequence[str]): Fields that are not columns of the model.
+
+    Returns:
+        list: The column attributes to pass to `select()`.
+    """
+    return [getattr(model, name) for name in schema.model_fields if name not in exclude]
+
+def rows_to_dicts(rows: Iterable) -> List[dict]:
+    """Converts result rows into plain dicts keyed by column label."""
+    return [dict(row._mapping) for row in rows] # pylint: disable=W0212
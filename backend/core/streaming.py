@@ -0,0 +1,65 @@
+import os
+from typing import AsyncIterator, Callable
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.database import read_session
+from .serialization import dumps
+
+# Rows fetched per server-side cursor round trip, and rows per written chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+async def _encode(rows: AsyncIterator[dict], fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Encodes rows as a JSON array or as NDJSON, one chunk per batch of rows."""
+    separator = b"\n" if fmt == "ndjson" else b","
+    chunk = []
+    first = True
+    if fmt == "json":
+        yield b"["
+    async for row in rows:
+        chunk.append(dumps(row))
+        if len(chunk) >= batch_size:
+            yield (b"" if first else separator) + separator.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else separator) + separator.join(chunk)
+        first = False
+    if fmt == "json":
+        yield b"]"
+    elif not first:
+        yield b"\n"
+
+def stream_export(request: Request,
+                  rows: Callable[[AsyncSession, int], AsyncIterator[dict]],
+                  fmt: str = "json",
+                  batch_size: int = EXPORT_BATCH_SIZE) -> StreamingResponse:
+    """
+    Streams every row of a query to the client as it is read.
+
+    The session is opened inside the response body rather than taken from a
+    dependency: dependency cleanup runs before a streamed body is sent, so a
+    request-scoped session would already be closed. Only one batch of rows
+    and one encoded chunk are held in memory at a time.
+
+    Args:
+        request (Request): The request, used to route the read session.
+        rows (Callable): Given a session and a batch size, yields the rows to
+            export as dicts already shaped like their response schema.
+        fmt (str): "json" for a JSON array or "ndjson" for one object per line.
+        batch_size (int): Rows per database fetch and per written chunk.
+
+    Returns:
+        StreamingResponse: The streamed export.
+    """
+    async def body():
+        async with read_session(request) as db:
+            async for chunk in _encode(rows(db, batch_size), fmt, batch_size):
+                yield chunk
+
+    return StreamingResponse(body(), media_type=EXPORT_FORMATS[fmt])
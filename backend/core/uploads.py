@@ -0,0 +1,95 @@
+import time
+from typing import AsyncIterator
+from fastapi import HTTPException, Request, status
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from .metrics import metrics
+
+# Multipart framing (boundaries, part headers) allowed on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+class _TooLarge(MultiPartException):
+    """Raised from inside the parser so it closes its temporary files."""
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail={
+            "code": "UPLOAD_001",
+            "message": f"Uploaded file must not exceed {max_bytes} bytes."
+        },
+    )
+
+def _invalid(message: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail={"code": "UPLOAD_002", "message": message},
+    )
+
+async def _capped(stream: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise _TooLarge("Request body too large.")
+        yield chunk
+
+async def receive_file(request: Request, field: str, max_bytes: int,
+                       metric: str = "uploads") -> UploadFile:
+    """
+    Reads a single file from a multipart request body, with a hard size cap.
+
+    The body is streamed into a temporary file (kept in memory up to 1 MB)
+    as it arrives, and reading stops as soon as the cap is passed, so an
+    oversized upload never reaches the disk in full. A `Content-Length`
+    above the cap is rejected before anything is read. Call this instead of
+    declaring an `UploadFile` parameter, which makes FastAPI read the whole
+    body before the handler runs.
+
+    Args:
+        request (Request): The incoming request.
+        field (str): The name of the form field holding the file.
+        max_bytes (int): The largest file accepted.
+        metric (str): The prefix of the size and throughput metrics.
+
+    Raises:
+        HTTPException: 413 error if the file is too large, 400 error if the
+            body is not a multipart form with that file.
+
+    Returns:
+        UploadFile: The file, positioned at its start. The caller closes it.
+    """
+    limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+    content_length = request.headers.get("Content-Length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        metrics.incr(f"{metric}.rejected")
+        raise _too_large(max_bytes)
+    if not request.headers.get("Content-Type", "").startswith("multipart/form-data"):
+        raise _invalid("Expected a multipart/form-data body.")
+
+    started = time.perf_counter()
+    parser = MultiPartParser(request.headers, _capped(request.stream(), limit),
+                             max_files=1, max_fields=0)
+    try:
+        form = await parser.parse()
+    except _TooLarge as exc:
+        metrics.incr(f"{metric}.rejected")
+        raise _too_large(max_bytes) from exc
+    except MultiPartException as exc:
+        raise _invalid(exc.message) from exc
+    elapsed = time.perf_counter() - started
+
+    upload = form.get(field)
+    if not isinstance(upload, UploadFile):
+        await form.close()
+        raise _invalid(f"Missing file field '{field}'.")
+    if upload.size > max_bytes:
+        await form.close()
+        metrics.incr(f"{metric}.rejected")
+        raise _too_large(max_bytes)
+
+    metrics.incr(f"{metric}.bytes", upload.size)
+    metrics.observe(f"{metric}.seconds", elapsed)
+    if elapsed > 0:
+        metrics.observe(f"{metric}.bytes_per_second", upload.size / elapsed)
+    return upload
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from cachetools import TLRUCache
+from .metrics import metrics
+
+CURRENT_USER_CACHE_SIZE = int(os.getenv("CURRENT_USER_CACHE_SIZE", "10000"))
+CURRENT_USER_CACHE_TTL_SECONDS = float(os.getenv("CURRENT_USER_CACHE_TTL_SECONDS", "30"))
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """An immutable, session-independent copy of the authenticated user's row."""
+    id: int
+    uid: str
+    username: str
+    email: str
+    icon: Optional[str]
+    date_created: Optional[datetime]
+    google_login: bool
+
+    @classmethod
+    def from_model(cls, user) -> "UserSnapshot":
+        """Copies the public columns of a `models.User`."""
+        return cls(
+            id=user.id,
+            uid=user.uid,
+            username=user.username,
+            email=user.email,
+            icon=user.icon,
+            date_created=user.date_created,
+            google_login=bool(user.google_login),
+        )
+
+class CurrentUserCache:
+    """
+    Short-lived, size-bounded cache of verified access token -> user snapshot.
+
+    Entries expire after `ttl` seconds or when the token itself expires,
+    whichever comes first, and are dropped as soon as the user is modified.
+    Invalidation is per process; the short TTL bounds staleness across workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = TLRUCache(maxsize=maxsize, ttu=lambda _k, v, _now: v[1],
+                                  timer=time.time)
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation. Read it before loading a user from the database."""
+        return self._generation
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        """Returns the cached user for a token, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(token)
+        metrics.incr("current_user.cache.hit" if entry else "current_user.cache.miss")
+        return entry[0] if entry else None
+
+    def put(self, token: str, user: UserSnapshot,
+            token_expires_at: Optional[float], generation: int):
+        """
+        Caches the user resolved for a token.
+
+        The entry is skipped if any user was invalidated since `generation` was
+        read, so a lookup racing with an update cannot cache the old row.
+        """
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[token] = (user, expires_at)
+
+    def invalidate(self, user_id: int):
+        """Drops every cached token of a user. Call after the user row changes."""
+        with self._lock:
+            self._generation += 1
+            stale = [token for token, (user, _) in self._entries.items() if user.id == user_id]
+            for token in stale:
+                del self._entries[token]
+
+current_user_cache = CurrentUserCache(
+    maxsize=CURRENT_USER_CACHE_SIZE,
+    ttl=CURRENT_USER_CACHE_TTL_SECONDS,
+)
@@ -1,15 +1,17 @@
 # utils.py
+import codecs
 from html import unescape
+from html.parser import HTMLParser
 import os
 import re
 from pathlib import Path
 from email.message import EmailMessage
 import smtplib
 import logging
-import requests
-import ulid
+import aiohttp
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+from .http import http_client
+from .icons import ICON_MAX_BYTES, InvalidImage, sniff_image_format
 
 logger = logging.getLogger(__name__)
 path = Path(__file__).resolve().parent.parent
@@ -21,38 +23,112 @@ SES_SMTP_USERNAME = os.getenv("SES_SMTP_USERNAME")
 SES_SMTP_PASSWORD = os.getenv("SES_SMTP_PASSWORD")
 RESET_PASSWORD_URL = os.getenv("RESET_PASSWORD_URL")
 
-def extract_metadata(url: str) -> dict:
+# Link previews only need the <head>; never read more than this from a page
+LINK_PREVIEW_MAX_BYTES = int(os.getenv("LINK_PREVIEW_MAX_BYTES", str(256 * 1024)))
+LINK_PREVIEW_TIMEOUT_SECONDS = float(os.getenv("LINK_PREVIEW_TIMEOUT_SECONDS", "10"))
+ICON_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("ICON_DOWNLOAD_TIMEOUT_SECONDS", "15"))
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+PREVIEW_META_TAGS = {
+    "og:title", "twitter:title",
+    "og:description", "twitter:description",
+    "og:image", "twitter:image",
+}
+
+class PreviewMetaParser(HTMLParser):
+    """
+    Incremental HTML parser that collects the link preview tags of a page.
+
+    Feed it chunks as they arrive; `done` becomes True once the end of the
+    <head> (or the start of the <body>) has been seen.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = None
+        self.done = False
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key in PREVIEW_META_TAGS and key not in self.meta:
+                self.meta[key] = attrs.get("content")
+        elif tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip() or None
+            self._title_parts = None
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def metadata(self) -> dict:
+        """Returns the collected 'title', 'description' and 'image_url'."""
+        return {
+            "title": self.meta.get("og:title") or self.meta.get("twitter:title") or self.title,
+            "description": self.meta.get("og:description") or \
+                self.meta.get("twitter:description"),
+            "image_url": self.meta.get("og:image") or self.meta.get("twitter:image"),
+        }
+
+def _content_type_charset(content_type: str) -> str:
+    """Returns the charset declared in a Content-Type header, defaulting to UTF-8."""
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            charset = value.strip().strip("\"'")
+            try:
+                return codecs.lookup(charset).name
+            except LookupError:
+                break
+    return "utf-8"
+
+async def extract_metadata(url: str) -> dict:
     """
     Extract Open Graph and Twitter metadata from the given URL.
 
+    The page is streamed through the shared HTTP client and parsed
+    incrementally; reading stops at the end of the <head>, after
+    LINK_PREVIEW_MAX_BYTES, or after LINK_PREVIEW_TIMEOUT_SECONDS in total.
+    Responses that are not HTML are not read at all.
+
     Args:
         url (str): The URL to scrape metadata from.
 
+    Raises:
+        aiohttp.ClientError: If the page could not be fetched.
+        asyncio.TimeoutError: If the page took too long to respond.
+
     Returns:
         dict: A dictionary containing 'title', 'description', and 'image_url'.
     """
-    try:
-        response = requests.get(url, timeout=10)
+    parser = PreviewMetaParser()
+    timeout = aiohttp.ClientTimeout(total=LINK_PREVIEW_TIMEOUT_SECONDS)
+    async with http_client.session.get(url, timeout=timeout) as response:
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        metadata = {
-            "title": soup.find("meta", property="og:title") or \
-                soup.find("meta", property="twitter:title") or soup.find("title"),
-            "description": soup.find("meta", property="og:description") or \
-                soup.find("meta", property="twitter:description") ,
-            "image_url": soup.find("meta", property="og:image") or \
-                soup.find("meta", property="twitter:image") 
-        }
+        content_type = response.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip().lower() not in HTML_CONTENT_TYPES:
+            return parser.metadata()
+
+        decoder = codecs.getincrementaldecoder(_content_type_charset(content_type))("replace")
+        received = 0
+        async for chunk in response.content.iter_chunked(8192):
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.done or received >= LINK_PREVIEW_MAX_BYTES:
+                break
+    return parser.metadata()
 
-        # Extract content from meta tags
-        metadata = {key: (tag.get("content") if tag else None) for key, tag in metadata.items()}
-        return metadata
-    except Exception as e:
-        # Log and return empty metadata on failure
-        logger.error("Failed to extract metadata for URL %s: %s", url, e)
-        return {"title": None, "description": None, "image_url": None}
-    
 def extract_url_from_text(text: str) -> str:
     """
     Extract the first URL from a given text.
@@ -98,47 +174,34 @@ def send_reset_email(email: str, token: str):
                      email, general_error)
         raise
 
-def download_user_icon(url: str, user_id: str) -> str:
+async def download_user_icon(url: str) -> bytes:
     """
-    Downloads a user icon from the specified URL and saves it locally with a unique filename.
+    Downloads a user icon from the specified URL.
+
+    The download is abandoned as soon as it exceeds ICON_MAX_BYTES, and
+    kept only if its leading bytes are those of an accepted image format.
 
     Args:
         url (str): The URL of the user icon to download.
-        user_id (str): The unique identifier of the user, used in the generated filename.
+
+    Raises:
+        aiohttp.ClientError: If the image could not be fetched.
+        asyncio.TimeoutError: If it took longer than ICON_DOWNLOAD_TIMEOUT_SECONDS.
+        InvalidImage: If it is too large or not an accepted image format.
 
     Returns:
-        str: The filename of the saved icon.
+        bytes: The encoded image.
     """
-    try:
-        response = requests.get(url, stream=True, timeout=None)
+    timeout = aiohttp.ClientTimeout(total=ICON_DOWNLOAD_TIMEOUT_SECONDS)
+    async with http_client.session.get(url, timeout=timeout) as response:
         response.raise_for_status()
-
-        # Get the content type from the response headers
-        content_type = response.headers.get('Content-Type', '')
-
-        # Map common MIME types to file extensions
-        mime_to_extension = {
-            "image/jpeg": "jpg",
-            "image/png": "png",
-            "image/gif": "gif",
-            "image/webp": "webp",
-        }
-        file_extension = mime_to_extension.get(content_type, "png")  # Default to 'png' if unknown
-
-        # Define file name based on user ID and ULID
-        icon_filename = f"{user_id}I{str(ulid.new())}.{file_extension}"
-        icon_path = Path(path / f"static/icons/{icon_filename}")
-
-        # Ensure the directory exists
-        icon_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write the image to the file
-        with open(icon_path, "wb") as icon_file:
-            for chunk in response.iter_content(1024):
-                icon_file.write(chunk)
-
-        # Return only the filename
-        return icon_filename
-
-    except requests.RequestException as exc:
-        return exc
+        if (response.content_length or 0) > ICON_MAX_BYTES:
+            raise InvalidImage(f"{response.content_length} bytes is too large")
+        data = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            data += chunk
+            if len(data) > ICON_MAX_BYTES:
+                raise InvalidImage(f"more than {ICON_MAX_BYTES} bytes")
+    if sniff_image_format(data[:12]) is None:
+        raise InvalidImage("not a supported image format")
+    return bytes(data)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from ..core.icon_storage import icon_storage, local_icon_storage
+from ..core.icons import blob_files, blob_hash, content_hash, icon_files, server_busy, \
+    write_variants
+from ..core.metrics import metrics
+from ..db import models
+from ..db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Unreferenced icons are kept this long before their files are deleted
+ICON_GC_GRACE_SECONDS = float(os.getenv("ICON_GC_GRACE_SECONDS", str(24 * 3600)))
+ICON_GC_INTERVAL_SECONDS = float(os.getenv("ICON_GC_INTERVAL_SECONDS", "3600"))
+ICON_GC_BATCH_SIZE = int(os.getenv("ICON_GC_BATCH_SIZE", "100"))
+ACQUIRE_ATTEMPTS = 3
+
+Blob = models.IconBlob
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def _acquire(digest: str) -> bool:
+    """
+    Takes a reference on a blob, creating its row if needed. Returns False if
+    the collector is deleting it or another writer just created it.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(Blob)
+            .where(Blob.hash == digest, Blob.refcount >= 0)
+            .values(refcount=Blob.refcount + 1, updated_at=_now())
+        )
+        if result.rowcount == 0:
+            try:
+                await db.execute(insert(Blob).values(hash=digest, refcount=1, updated_at=_now()))
+            except IntegrityError:
+                await db.rollback()
+                return False
+        await db.commit()
+        return True
+
+async def _release(digest: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Blob)
+            .where(Blob.hash == digest, Blob.refcount > 0)
+            .values(refcount=Blob.refcount - 1, updated_at=_now())
+        )
+        await db.commit()
+
+async def store_icon(data: bytes) -> str:
+    """
+    Stores an image as an icon and takes a reference on it.
+
+    Icons are content-addressed: an image that is already stored (the same
+    upload, or the same avatar for another user) is neither rendered nor
+    written again. The reference is taken before the files are checked, so
+    the garbage collector cannot delete them in between.
+
+    Args:
+        data (bytes): The encoded source image.
+
+    Raises:
+        InvalidImage: If the data is not a decodable image.
+        HTTPException: 503 error if the icon could not be referenced, or
+            the icon process pool is saturated.
+
+    Returns:
+        str: The icon to store in User.icon. Pass it to `release_icon` once
+        no user references it any more.
+    """
+    digest = content_hash(data)
+    for attempt in range(1, ACQUIRE_ATTEMPTS + 1):
+        if await _acquire(digest):
+            break
+        await asyncio.sleep(0.05 * attempt)
+    else:
+        raise server_busy()
+
+    icon = blob_files(digest)[-1]
+    try:
+        if await icon_storage.exists(icon):
+            metrics.incr("icons.deduplicated")
+        else:
+            await write_variants(digest, data)
+    except Exception:
+        await _release(digest)
+        raise
+    return icon
+
+async def release_icon(icon: Optional[str]):
+    """
+    Drops a reference on an icon, once the user row no longer points to it.
+
+    An unreferenced icon is deleted by the garbage collector after a grace
+    period. Icons stored before content addressing were never shared and
+    are deleted right away from the local icon directory, where they were
+    stored; the shared default icon is kept.
+    """
+    if not icon or icon == "default.png":
+        return
+    digest = blob_hash(icon)
+    if digest is not None:
+        await _release(digest)
+        return
+    try:
+        await local_icon_storage.delete(icon_files(icon))
+    except ValueError as exc:
+        # Not a file name the storage could have written
+        logger.warning("Not deleting icon %r: %s", icon, exc)
+
+async def collect_icon_garbage(grace_seconds: float = ICON_GC_GRACE_SECONDS,
+                               batch_size: int = ICON_GC_BATCH_SIZE) -> int:
+    """
+    Deletes the files of icons that have been unreferenced for `grace_seconds`.
+
+    Each blob is first claimed (refcount -1) with a conditional update, so
+    only one collector handles it and `store_icon` cannot reference it while
+    its files are deleted; the row is removed last. A claim left behind by
+    a crashed collector is picked up again after the grace period.
+
+    Returns:
+        int: The number of icons deleted.
+    """
+    cutoff = _now() - timedelta(seconds=grace_seconds)
+    unreferenced = (Blob.refcount <= 0, Blob.updated_at < cutoff)
+    collected = 0
+    async with AsyncSessionLocal() as db:
+        digests = (await db.scalars(
+            select(Blob.hash).where(*unreferenced).limit(batch_size)
+        )).all()
+        for digest in digests:
+            claimed = await db.execute(
+                update(Blob).where(Blob.hash == digest, *unreferenced)
+                .values(refcount=-1, updated_at=_now())
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                continue
+            await icon_storage.delete(blob_files(digest))
+            await db.execute(delete(Blob).where(Blob.hash == digest, Blob.refcount == -1))
+            await db.commit()
+            collected += 1
+    metrics.incr("icons.collected", collected)
+    return collected
+
+class IconCollector:
+    """Runs `collect_icon_garbage` periodically in the background."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Schedules the periodic collection."""
+        self._task = asyncio.create_task(self._loop(), name="icon-gc")
+
+    async def stop(self):
+        """Stops the periodic collection."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                collected = await collect_icon_garbage()
+                if collected:
+                    logger.info("Deleted %d unreferenced icons.", collected)
+            except Exception as exc: # pylint: disable=W0718
+                logger.warning("Icon garbage collection failed: %s", exc)
+
+icon_collector = IconCollector(interval=ICON_GC_INTERVAL_SECONDS)
@@ -1,24 +1,69 @@
-from typing import List
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
 import logging
+import os
 from fastapi import HTTPException, status
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import ulid
 from ..schemas import posts as post_schemas
-from ..core.utils import extract_url_from_text, extract_metadata 
+from ..core.utils import extract_url_from_text, extract_metadata
+from ..core.pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor
+from ..core.jobs import JobQueue
+from ..core.conditional import change_versions
+from ..core.metadata_cache import metadata_cache
+from ..core.pubsub import EventBus
+from ..core.feed_cache import feed_cache
+from ..core.icons import with_icon_variants
+from ..core.serialization import dumps, schema_columns
 from ..db import models
+from ..db.database import AsyncSessionLocal
+from ..db.search import query_terms, search_backend
 
 logger = logging.getLogger(__name__)
 
-def create_post(db: Session,
-                post: post_schemas.PostCreate,
-                user_id: int) -> models.Post:
+ENRICHMENT_PENDING = "pending"
+ENRICHMENT_DONE = "done"
+ENRICHMENT_FAILED = "failed"
+
+# Columns selected for the fast read path, in response schema field order
+POST_COLUMNS = schema_columns(post_schemas.PostResponse, models.Post, exclude=("author",))
+AUTHOR_FIELDS = schema_columns(post_schemas.AuthorSummary, models.User)
+AUTHOR_COLUMNS = [column.label(f"author_{column.key}") for column in AUTHOR_FIELDS]
+
+# Link previews are fetched off the request path by this worker pool
+enrichment_queue = JobQueue(
+    "link-preview",
+    workers=int(os.getenv("ENRICHMENT_WORKERS", "4")),
+    max_attempts=int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3")),
+    backoff=float(os.getenv("ENRICHMENT_RETRY_BACKOFF_SECONDS", "2")),
+)
+
+# Re-renders the cached first pages of the feed after writes, one run at a time
+feed_refresh_queue = JobQueue("feed-refresh", workers=1, max_attempts=1)
+
+# Live feed events, streamed to clients by GET /posts/stream
+post_events = EventBus(
+    "post_events",
+    replay_size=int(os.getenv("SSE_REPLAY_SIZE", "1000")),
+    queue_size=int(os.getenv("SSE_QUEUE_SIZE", "100")),
+    heartbeat=float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")),
+)
+
+async def create_post(db: AsyncSession,
+                      post: post_schemas.PostCreate,
+                      user_id: int) -> models.Post:
     """
     Creates a new post in the database.
 
+    The post is committed right away. If its text contains a link, the link
+    preview is taken from the in-process metadata cache when possible;
+    otherwise it is fetched in the background and the post is marked as
+    pending until then.
+
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         post (PostCreate): The post creation schema.
 
     Returns:
@@ -27,37 +72,328 @@ def create_post(db: Session,
     try:
         pid = str(ulid.new())
 
-        # Extract URL and metadata
         url = extract_url_from_text(post.text)
-        metadata = extract_metadata(url) if url else {}
+        cached = metadata_cache.peek(url) if url else None
         db_post = models.Post(
             pid=pid,
             text=post.text,
             user_id=user_id,
-            title=metadata.get("title"),
-            description=metadata.get("description"),
-            image_url=metadata.get("image_url")
+            enrichment_status=ENRICHMENT_PENDING if url else None
         )
+        if cached:
+            _apply_metadata(db_post, cached.metadata)
+            url = None  # Nothing left to fetch
         db.add(db_post)
-        db.commit()
-        db.refresh(db_post)
-        return db_post
+        await db.commit()
+        await db.refresh(db_post)
     except SQLAlchemyError as exc:
-        db.rollback()
+        await db.rollback()
         logger.error("Database error while creating post: %s", exc)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected database error occurred."
         ) from exc
 
-def get_all_posts(db: Session) -> List[models.Post]:
+    await posts_changed()
+    post_events.publish("post.created", _post_payload(db_post))
+    if url:
+        enrichment_queue.submit(enrich_post, db_post.id, url, on_failure=mark_enrichment_failed)
+    return db_post
+
+async def enrich_post(post_id: int, url: str):
+    """
+    Resolves the link preview of a post, from the metadata cache or by fetching
+    the page, and stores it. Runs as a background job.
+
+    Args:
+        post_id (int): The ID of the post to enrich.
+        url (str): The URL to fetch the preview from.
+
+    Raises:
+        aiohttp.ClientError: If the page could not be fetched; the job is retried.
+        asyncio.TimeoutError: If the page took too long; the job is retried.
+    """
+    async with AsyncSessionLocal() as db:
+        cached = await metadata_cache.get(db, url)
+        if cached:
+            metadata = cached.metadata
+        else:
+            metadata = await extract_metadata(url)
+            await metadata_cache.store(db, url, metadata)
+
+        db_post = await db.get(models.Post, post_id)
+        if db_post is None:
+            return
+        _apply_metadata(db_post, metadata)
+        await db.commit()
+        await posts_changed()
+        post_events.publish("post.enriched", _post_payload(db_post))
+
+async def mark_enrichment_failed(post_id: int, url: str):
+    """
+    Marks a post whose link preview could not be fetched as failed and
+    caches the failure.
+
+    Args:
+        post_id (int): The ID of the post.
+        url (str): The URL that could not be fetched.
+    """
+    async with AsyncSessionLocal() as db:
+        await metadata_cache.store(db, url, None)
+        await db.execute(
+            update(models.Post)
+            .where(models.Post.id == post_id)
+            .values(enrichment_status=ENRICHMENT_FAILED)
+        )
+        await db.commit()
+        await posts_changed()
+        db_post = await db.get(models.Post, post_id)
+        if db_post is not None:
+            post_events.publish("post.enriched", _post_payload(db_post))
+
+async def posts_changed():
+    """
+    Bumps the posts version after a committed change, which makes the cached
+    feed pages stale, and schedules their re-rendering (write-through).
+
+    Only the bump happens on the write path; readers that arrive before the
+    refresh rebuild a stale page themselves.
+    """
+    await change_versions.bump("posts")
+    if feed_refresh_queue.running:
+        feed_refresh_queue.submit(refresh_feed_cache, coalesce=True)
+
+async def refresh_feed_cache():
+    """
+    Re-renders the default first pages of the feed into the feed cache.
+    Runs as a coalesced background job: changes made while it is queued are
+    covered by the same run.
+    """
+    async with AsyncSessionLocal() as db:
+        for include_author in (False, True):
+            try:
+                tag = await change_versions.tag(*feed_tables(include_author))
+                body = await render_feed_page(db, None, DEFAULT_PAGE_SIZE, include_author)
+                await feed_cache.put(DEFAULT_PAGE_SIZE, include_author, tag, body)
+            except Exception as exc: # pylint: disable=W0718
+                # Readers rebuild a stale page themselves
+                logger.warning("Could not refresh the feed cache: %s", exc)
+
+def _apply_metadata(db_post: models.Post, metadata: Optional[dict]):
+    """Copies link preview metadata onto a post; None marks the preview as failed."""
+    if metadata is None:
+        db_post.enrichment_status = ENRICHMENT_FAILED
+        return
+    db_post.title = metadata.get("title")
+    db_post.description = metadata.get("description")
+    db_post.image_url = metadata.get("image_url")
+    db_post.enrichment_status = ENRICHMENT_DONE
+
+async def requeue_pending_enrichments():
+    """Re-submits posts left pending by a previous process, e.g. after a restart."""
+    async with AsyncSessionLocal() as db:
+        pending = (await db.execute(
+            select(models.Post.id, models.Post.text)
+            .where(models.Post.enrichment_status == ENRICHMENT_PENDING)
+        )).all()
+    for post_id, text in pending:
+        url = extract_url_from_text(text)
+        if url:
+            enrichment_queue.submit(enrich_post, post_id, url, on_failure=mark_enrichment_failed)
+
+async def get_posts_page(db: AsyncSession,
+                         cursor: Optional[str],
+                         limit: int,
+                         include_author: bool = False) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retrieves one page of the feed, newest first, using keyset pagination.
+
+    Only the columns of `PostResponse` are selected and each row is returned
+    as a dict of that shape, so the page can be encoded without building ORM
+    objects or validating every row.
+
+    Args:
+        db (AsyncSession): The database session.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int): The maximum number of posts to return.
+        include_author (bool): Whether to load each post's author in the same query.
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: The posts of the page and the cursor
+        of the next page, or None if this is the last page.
+    """
+    query = select(*POST_COLUMNS)
+    if include_author:
+        query = query.add_columns(*AUTHOR_COLUMNS).outerjoin(models.Post.author)
+    if cursor:
+        date_created, pid = decode_cursor(cursor, (datetime, str))
+        query = query.where(or_(
+            models.Post.date_created < date_created,
+            and_(models.Post.date_created == date_created, models.Post.pid < pid)
+        ))
+
+    query = query.order_by(desc(models.Post.date_created), desc(models.Post.pid)) \
+                 .limit(limit + 1)
+    posts = [_post_row(row, include_author) for row in await db.execute(query)]
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1]["date_created"], posts[-1]["pid"])
+    return posts, next_cursor
+
+async def get_user_posts_page(db: AsyncSession,
+                              user_id: int,
+                              cursor: Optional[str],
+                              limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retrieves one page of a user's posts, newest first, using keyset
+    pagination on (date_created, id) over the (user_id, date_created, id) index.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The ID of the author.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int): The maximum number of posts to return.
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: The posts of the page and the cursor
+        of the next page, or None if this is the last page.
+    """
+    query = select(*POST_COLUMNS).where(models.Post.user_id == user_id)
+    if cursor:
+        date_created, post_id = decode_cursor(cursor, (datetime, int))
+        query = query.where(or_(
+            models.Post.date_created < date_created,
+            and_(models.Post.date_created == date_created, models.Post.id < post_id)
+        ))
+
+    query = query.order_by(desc(models.Post.date_created), desc(models.Post.id)) \
+                 .limit(limit + 1)
+    posts = [_post_row(row, False) for row in await db.execute(query)]
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1]["date_created"], posts[-1]["id"])
+    return posts, next_cursor
+
+async def search_posts(db: AsyncSession,
+                       query: str,
+                       cursor: Optional[str],
+                       limit: int,
+                       include_author: bool = False) -> Tuple[List[dict], Optional[str]]:
     """
-    Retrieves all posts from the database.
+    Retrieves one page of the posts matching a full-text query, best match
+    first, using keyset pagination on (rank, id).
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
+        query (str): The user's search query; each word matches as a prefix.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int): The maximum number of posts to return.
+        include_author (bool): Whether to load each post's author in the same query.
+
+    Raises:
+        HTTPException: 400 error if the query contains no words.
+        HTTPException: 501 error if the database has no full-text search.
 
     Returns:
-        List[Post]: A list of all post instances.
+        Tuple[List[dict], Optional[str]]: The posts of the page and the cursor
+        of the next page, or None if this is the last page.
+    """
+    if search_backend is None:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail={
+            "code": "SEARCH_002",
+            "message": "Search is not available on this database."
+        })
+    terms = query_terms(query)
+    if not terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={
+            "code": "SEARCH_001",
+            "message": "The search query must contain at least one word."
+        })
+
+    matches = search_backend.matches(terms)
+    statement = select(*POST_COLUMNS, matches.c.rank) \
+        .join(matches, matches.c.id == models.Post.id)
+    if include_author:
+        statement = statement.add_columns(*AUTHOR_COLUMNS).outerjoin(models.Post.author)
+    if cursor:
+        rank, post_id = decode_cursor(cursor, (float, int))
+        statement = statement.where(or_(
+            matches.c.rank > rank,
+            and_(matches.c.rank == rank, models.Post.id > post_id)
+        ))
+
+    statement = statement.order_by(matches.c.rank, models.Post.id).limit(limit + 1)
+    rows = (await db.execute(statement)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+    return [_post_row(row, include_author) for row in rows], next_cursor
+
+def feed_tables(include_author: bool) -> Tuple[str, ...]:
+    """Returns the tables a feed page is read from, for its version tag."""
+    return ("posts", "users") if include_author else ("posts",)
+
+async def render_feed_page(db: AsyncSession,
+                           cursor: Optional[str],
+                           limit: int,
+                           include_author: bool = False) -> bytes:
+    """
+    Renders one page of the feed to the JSON body of a `PostPage`.
+
+    Args:
+        db (AsyncSession): The database session.
+        cursor (str, optional): The cursor returned with the previous page.
+        limit (int): The maximum number of posts to return.
+        include_author (bool): Whether to embed each post's author.
+
+    Returns:
+        bytes: The encoded page.
+    """
+    posts, next_cursor = await get_posts_page(db, cursor=cursor, limit=limit,
+                                              include_author=include_author)
+    return dumps({"items": posts, "next_cursor": next_cursor})
+
+def _post_payload(db_post: models.Post) -> dict:
+    """Shapes a post like `PostResponse`, without its author, for a live feed event."""
+    post = {column.key: getattr(db_post, column.key) for column in POST_COLUMNS}
+    post["author"] = None
+    return post
+
+def _post_row(row, include_author: bool) -> dict:
+    """
+    Shapes a feed row like `PostResponse`, nesting the author columns if
+    selected. The author is None if selected but missing: posts written
+    before authors were deleted with their posts can outlive them.
+    """
+    mapping = row._mapping # pylint: disable=W0212
+    post = {column.key: mapping[column.key] for column in POST_COLUMNS}
+    post["author"] = with_icon_variants({
+        column.key: mapping[f"author_{column.key}"] for column in AUTHOR_FIELDS
+    }) if include_author and mapping["author_id"] is not None else None
+    return post
+
+async def stream_all_posts(db: AsyncSession, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Yields every post, newest first, reading them through a server-side
+    cursor in batches.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int): The number of rows fetched per round trip.
+
+    Yields:
+        dict: The next post of the feed, shaped like `PostResponse` without its author.
     """
-    return db.query(models.Post).order_by(desc(models.Post.date_created)).all()
+    result = await db.stream(
+        select(*POST_COLUMNS)
+        .order_by(desc(models.Post.date_created), desc(models.Post.pid))
+        .execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield dict(row._mapping) # pylint: disable=W0212
@@ -1,60 +1,102 @@
+import logging
 import os
-from pathlib import Path
-import shutil
-from typing import Optional, List
-from fastapi import Depends, HTTPException, UploadFile, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+import time
+from typing import AsyncIterator, Optional, List
+import aiohttp
+from fastapi import Depends, HTTPException, UploadFile, status
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from jose import JWTError, jwt
 import ulid
-from ..db import models, get_db
+from ..db import models, get_async_db
+from ..db.database import AsyncSessionLocal
 from ..schemas import users as user_schemas
 from ..core import auth
 from ..core.auth import oauth2_scheme, SECRET_KEY, ALGORITHM
-
-# Resolve the path to the backend directory
-BASE_DIR = Path(__file__).resolve().parent.parent
-ICON_DIR = BASE_DIR / "static/icons"
-ICON_DIR.mkdir(parents=True, exist_ok=True)
-
-def create_user(db: Session,
-                user: user_schemas.UserCreate,
-                google_login: bool = False) -> models.User:
+from ..core.conditional import change_versions
+from ..core.icon_storage import icon_storage
+from ..core.icons import InvalidImage, icon_variants, sniff_image_format, with_icon_variants
+from ..core.jobs import JobQueue
+from ..core.metrics import metrics
+from ..core.serialization import rows_to_dicts, schema_columns
+from ..core.user_cache import UserSnapshot, current_user_cache
+from ..core.utils import download_user_icon
+from . import posts as crud_posts
+from .icons import release_icon, store_icon
+
+logger = logging.getLogger(__name__)
+
+# Columns selected for the fast read path, in response schema field order
+USER_COLUMNS = schema_columns(user_schemas.UserResponse, models.User)
+
+# Google avatars are fetched off the login path by this worker pool
+avatar_queue = JobQueue(
+    "avatar",
+    workers=int(os.getenv("AVATAR_WORKERS", "2")),
+    max_attempts=int(os.getenv("AVATAR_MAX_ATTEMPTS", "3")),
+    backoff=float(os.getenv("AVATAR_RETRY_BACKOFF_SECONDS", "2")),
+)
+
+async def create_user(db: AsyncSession,
+                      user: user_schemas.UserCreate,
+                      google_login: bool = False,
+                      pending_avatar_url: Optional[str] = None) -> models.User:
     """
     Creates a new user in the database.
 
+    Uniqueness of the username and email (case-insensitive) is left to the
+    database: the row is inserted in a single `INSERT ... RETURNING` and a
+    constraint violation is reported as a duplicate.
+
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user (UserCreate): The user creation schema.
         google_login (bool): Whether the user is a Google login user.
+        pending_avatar_url (str, optional): A Google picture to fetch as the
+            icon; submit `fetch_user_avatar` for it once the user is created.
+
+    Raises:
+        HTTPException: 400 error if the username or email is already registered.
 
     Returns:
         User: The created user instance.
     """
-    hashed_password = auth.hash_password(user.password) if user.password else None
+    hashed_password = await auth.hash_password_async(user.password) \
+        if user.password else None
     uid = str(ulid.new())
-    db_user = models.User(
-        username=user.username,
-        uid=uid,
-        email=user.email,
-        password=hashed_password,
-        icon=user.icon,
-        google_login=google_login
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        db_user = await db.scalar(
+            insert(models.User)
+            .values(
+                username=user.username,
+                uid=uid,
+                email=user.email,
+                password=hashed_password,
+                google_login=google_login,
+                pending_avatar_url=pending_avatar_url
+            )
+            .returning(models.User)
+        )
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered."
+        ) from exc
+    await change_versions.bump("users")
     return db_user
 
-def update_user(
-        db: Session,
+async def update_user(
+        db: AsyncSession,
         user_id: int,
         user_update: user_schemas.UserUpdate) -> Optional[models.User]:
     """
     Updates an existing user's details in the database.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user_id (int): The ID of the user to update.
         user_update (UserUpdate): The updated user data.
 
@@ -62,7 +104,7 @@ def update_user(
         User or None: The updated user instance or None if not found.
     """
     # Retrieve the user from the database
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if db_user:
         # Use model_dump(exclude_unset=True) to include only provided fields
         update_data = user_update.model_dump(exclude_unset=True)
@@ -70,32 +112,35 @@ def update_user(
             setattr(db_user, key, value)
 
         # Commit the changes to the database
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        current_user_cache.invalidate(user_id)
+        await change_versions.bump("users")
     return db_user
 
-def update_password(
-        db: Session,
+async def update_password(
+        db: AsyncSession,
         user_id: int,
         new_password: str) -> Optional[models.User]:
     """
     Updates an existing user's password in the database.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user_id (int): The ID of the user to update.
         new_password (str): The new password to set.
 
     Returns:
         User or None: The updated user instance or None if not found.
     """
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if db_user:
         try:
-            hashed_password = auth.hash_password(new_password)
+            hashed_password = await auth.hash_password_async(new_password)
             db_user.password = hashed_password
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
+            await db.refresh(db_user)
+            current_user_cache.invalidate(user_id)
         except JWTError as exc:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -106,7 +151,7 @@ def update_password(
                 headers={"WWW-Authenticate": "Bearer"},
             ) from exc
         except SQLAlchemyError as exc:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail={
@@ -116,95 +161,210 @@ def update_password(
             ) from exc
     return db_user
 
-def update_user_icon(
-    db: Session,
-    user_id: int,
-    file: UploadFile,
-    background_tasks: BackgroundTasks,
-) -> dict:
+async def update_user_icon(db: AsyncSession, user_id: int, file: UploadFile) -> dict:
     """
     Updates a user's profile icon.
 
+    The upload is decoded and re-encoded as square WebP variants (see
+    core/icons.py); the original bytes are never served. Its type is taken
+    from its leading bytes, not from the declared content type. The new
+    icon is referenced before the user row points to it and the old one
+    released after, so a failure can leak an icon but never delete one in
+    use (see crud/icons.py).
+
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user_id (int): The ID of the user whose icon is being updated.
-        file (UploadFile): The uploaded image file.
-        background_tasks (BackgroundTasks): To handle image cleanup.
+        file (UploadFile): The uploaded image file, see `receive_file`.
+
+    Raises:
+        HTTPException: 404 error if the user does not exist.
+        HTTPException: 400 error if the file is not an image.
+        HTTPException: 409 error if the icon was changed concurrently.
 
     Returns:
-        dict: Success message and new icon URL.
+        dict: Success message, new icon URL and the URL of each variant.
+    """
+    try:
+        # Fetch the user
+        user = await get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found.")
+
+        # Validate file type
+        if sniff_image_format(await file.read(12)) is None:
+            raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
+        await file.seek(0)
+        data = await file.read()
+    finally:
+        await file.close()
+
+    try:
+        icon = await store_icon(data)
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail="Uploaded file must be an image.") from exc
+
+    # Update user's icon in the database, unless another request just did
+    old_icon = user.icon
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.icon.is_not_distinct_from(old_icon))
+        .values(icon=icon)
+    )
+    await db.commit()
+    if result.rowcount != 1:
+        await release_icon(icon)
+        raise HTTPException(status_code=409, detail="The icon was changed concurrently.")
+    await release_icon(old_icon)
+    current_user_cache.invalidate(user_id)
+    await change_versions.bump("users")
+
+    return {
+        "message": "Profile icon updated successfully",
+        "icon_url": icon_storage.url(icon),
+        "icon_variants": icon_variants(icon),
+    }
+
+async def fetch_user_avatar(user_id: int, url: str, submitted_at: float):
+    """
+    Downloads a new Google user's avatar and makes it their icon. Runs as a
+    background job, so login does not wait for Google's CDN.
+
+    The URL is kept in User.pending_avatar_url until the job is done or
+    given up on, so jobs lost to a restart are submitted again (see
+    `requeue_pending_avatars`). The icon is only set while the user has
+    none, so an icon uploaded in the meantime is kept. A URL that is not an
+    image, or that the server refuses, is given up on; other failures are
+    retried.
+
+    Args:
+        user_id (int): The ID of the user.
+        url (str): The URL of the avatar.
+        submitted_at (float): The `time.monotonic()` at which the job was queued.
+
+    Raises:
+        aiohttp.ClientError: If the avatar could not be fetched; the job is retried.
+        asyncio.TimeoutError: If the avatar took too long; the job is retried.
+        HTTPException: 503 error if icons cannot be processed now; the job is retried.
     """
-    # Fetch the user
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found.")
-
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Uploaded file must be an image.")
-
-    # Generate a unique filename
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{user.uid}_{ulid.new()}.{file_extension}"
-    file_path = ICON_DIR / unique_filename
-
-    # Save the new icon
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Schedule old icon cleanup if it exists and is not the default icon
-    if user.icon and user.icon != "default.png":
-        old_icon_path = ICON_DIR / user.icon
-        if old_icon_path.exists():
-            background_tasks.add_task(os.remove, old_icon_path)
-
-    # Update user's icon in the database
-    user.icon = unique_filename
-    db.commit()
-    db.refresh(user)
-
-    return {"message": "Profile icon updated successfully", "icon_url": f"/icons/{unique_filename}"}
-
-def delete_user(db: Session, user_id: int) -> Optional[models.User]:
+    try:
+        icon = await store_icon(await download_user_icon(url))
+    except InvalidImage as exc:
+        logger.warning("Google avatar of user %s is not a usable image: %s", user_id, exc)
+        metrics.incr("avatars.invalid")
+        await _clear_pending_avatar(user_id)
+        return
+    except aiohttp.ClientResponseError as exc:
+        if exc.status >= 500 or exc.status == 429:
+            raise
+        logger.warning("Google avatar of user %s could not be fetched: %s", user_id, exc)
+        metrics.incr("avatars.invalid")
+        await _clear_pending_avatar(user_id)
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(models.User)
+                .where(models.User.id == user_id, models.User.icon.is_(None))
+                .values(icon=icon, pending_avatar_url=None)
+            )
+            await db.commit()
+    except Exception:
+        # A retry stores the icon again and takes a new reference
+        await release_icon(icon)
+        raise
+    if result.rowcount != 1:
+        # The user was deleted or has uploaded an icon meanwhile
+        await release_icon(icon)
+        await _clear_pending_avatar(user_id)
+        return
+    current_user_cache.invalidate(user_id)
+    await change_versions.bump("users")
+    metrics.observe("avatars.seconds_to_icon", time.monotonic() - submitted_at)
+
+async def mark_avatar_failed(user_id: int, url: str, _submitted_at: float):
+    """Records a Google avatar that could not be fetched; the user keeps no icon."""
+    logger.error("Giving up on the Google avatar of user %s from %s.", user_id, url)
+    metrics.incr("avatars.failed")
+    await _clear_pending_avatar(user_id)
+
+async def _clear_pending_avatar(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.User).where(models.User.id == user_id).values(pending_avatar_url=None)
+        )
+        await db.commit()
+
+def submit_avatar_fetch(user_id: int, url: str):
+    """Queues `fetch_user_avatar` for a user's pending Google picture."""
+    avatar_queue.submit(fetch_user_avatar, user_id, url, time.monotonic(),
+                        on_failure=mark_avatar_failed)
+
+async def requeue_pending_avatars():
+    """Re-submits Google avatars left pending by a previous process, e.g. after a restart."""
+    async with AsyncSessionLocal() as db:
+        pending = (await db.execute(
+            select(models.User.id, models.User.pending_avatar_url)
+            .where(models.User.pending_avatar_url.is_not(None), models.User.icon.is_(None))
+        )).all()
+    for user_id, url in pending:
+        submit_avatar_fetch(user_id, url)
+
+async def delete_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
     """
-    Deletes an existing user from the database.
+    Deletes an existing user and all of their posts from the database.
+
+    The posts are removed with one bulk DELETE on the user_id index, in the
+    same transaction as the user; the foreign key cascades as a backstop.
+    The user's icon is released once the user is gone.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user_id (int): The ID of the user to delete.
 
     Returns:
         User or None: The deleted user instance or None if not found.
     """
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if db_user:
-        if db_user.icon and db_user.icon != "default.png":
-            background_tasks = BackgroundTasks()
-            icon_path = ICON_DIR / db_user.icon
-            if icon_path.exists():
-                background_tasks.add_task(os.remove, icon_path)
-
-        db.delete(db_user)
-        db.commit()
+        await db.execute(delete(models.Post).where(models.Post.user_id == user_id))
+        # The icon as of the delete, in case it changed since the user was loaded
+        icon = await db.scalar(
+            delete(models.User).where(models.User.id == user_id).returning(models.User.icon)
+        )
+        await db.commit()
+        current_user_cache.invalidate(user_id)
+        await change_versions.bump("users")
+        await crud_posts.posts_changed()
+        await release_icon(icon)
     return db_user
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: AsyncSession = Depends(get_async_db)
+) -> UserSnapshot:
     """
     Retrieves the current user based on the provided JWT access token.
 
+    Recently verified tokens are answered from `current_user_cache` without
+    decoding the token again or querying the database.
+
     Args:
         token (str): JWT access token from the Authorization header.
-        db (Session): Database session dependency.
+        db (AsyncSession): Database session dependency.
 
     Raises:
         HTTPException: If the token is invalid or user is not found.
 
     Returns:
-        models.User: The current authenticated user.
+        UserSnapshot: The current authenticated user.
     """
+    cached = current_user_cache.get(token)
+    if cached:
+        return cached
+
+    generation = current_user_cache.generation
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
@@ -217,7 +377,7 @@ def get_current_user(
                 },
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        user = get_user_by_email(db, email)
+        user = await get_user_by_email(db, email)
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -226,7 +386,9 @@ def get_current_user(
                     "message": "User not found."
                 },
             )
-        return user
+        snapshot = UserSnapshot.from_model(user)
+        current_user_cache.put(token, snapshot, payload.get("exp"), generation)
+        return snapshot
     except JWTError as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -237,79 +399,126 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         ) from exc
 
-def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
     """
     Fetches a user by their username.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         username (str): The username of the user.
 
     Returns:
         User or None: The fetched user or None if not found.
     """
-    return db.query(models.User).filter(models.User.username == username).first()
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalar_one_or_none()
+
+async def get_user_by_login(db: AsyncSession, login: str) -> Optional[models.User]:
+    """
+    Fetches a user by username or email, case-insensitively, in one query.
+
+    A username match wins over an email match, so a username that happens to
+    equal another user's email still logs in as its owner.
+
+    Args:
+        db (AsyncSession): The database session.
+        login (str): The username or email entered by the user.
+
+    Returns:
+        User or None: The fetched user or None if not found.
+    """
+    login = login.lower()
+    username_match = func.lower(models.User.username) == login
+    result = await db.execute(
+        select(models.User)
+        .where(or_(username_match, func.lower(models.User.email) == login))
+        .order_by(case((username_match, 0), else_=1))
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
 
-def get_user_by_uid(db: Session, uid: str) -> Optional[models.User]:
+async def get_user_by_uid(db: AsyncSession, uid: str) -> Optional[models.User]:
     """
     Fetches a user by their uid.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         uid (str): The uid of the user.
 
     Returns:
         User or None: The fetched user or None if not found.
     """
-    return db.query(models.User).filter(models.User.uid == uid).first()
+    result = await db.execute(select(models.User).where(models.User.uid == uid))
+    return result.scalar_one_or_none()
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[models.User]:
     """
     Fetches a user by their id.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         id (int): The id of the user.
 
     Returns:
         User or None: The fetched user or None if not found.
     """
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return await db.get(models.User, user_id)
 
-def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
     """
     Fetches a user by their email.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         email (str): The email of the user.
 
     Returns:
         User or None: The fetched user or None if not found.
     """
-    return db.query(models.User).filter(models.User.email == email).first()
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalar_one_or_none()
 
-def get_all_users(db: Session) -> List[models.User]:
+async def get_all_users(db: AsyncSession) -> List[dict]:
     """
     Retrieves all users from the database.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
-        List[User]: A list of all user instances.
+        List[dict]: Every user, shaped like `UserResponse`.
+    """
+    return [with_icon_variants(row)
+            for row in rows_to_dicts(await db.execute(select(*USER_COLUMNS)))]
+
+async def stream_all_users(db: AsyncSession, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Yields every user, reading them through a server-side cursor in batches.
+
+    Args:
+        db (AsyncSession): The database session.
+        batch_size (int): The number of rows fetched per round trip.
+
+    Yields:
+        dict: The next user, in id order, shaped like `UserResponse`.
     """
-    return db.query(models.User).all()
+    result = await db.stream(
+        select(*USER_COLUMNS).order_by(models.User.id).execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield with_icon_variants(dict(row._mapping)) # pylint: disable=W0212
 
-def get_users_by_ids(db: Session, user_ids: List[int]) -> List[models.User]:
+async def get_users_by_ids(db: AsyncSession, user_ids: List[int]) -> List[dict]:
     """
     Fetches multiple users by their IDs.
 
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         user_ids (List[int]): List of user IDs.
 
     Returns:
-        List[User]: A list of users matching the given IDs.
+        List[dict]: The users matching the given IDs, shaped like `UserResponse`.
     """
-    return db.query(models.User).filter(models.User.id.in_(user_ids)).all()
+    return [with_icon_variants(row) for row in rows_to_dicts(await db.execute(
+        select(*USER_COLUMNS).where(models.User.id.in_(user_ids))
+    ))]
@@ -1 +1 @@
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, async_engine, get_async_db, get_read_db
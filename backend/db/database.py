@@ -1,20 +1,82 @@
 import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
+from .engine import create_db_engine, create_async_db_engine
+from .routing import ReplicaRouter
 
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
 
-# Initialize the engine and base
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Async drivers used when SQLALCHEMY_ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def to_async_url(url: str) -> str:
+    """Returns the URL of the same database with the backend's async driver."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or \
+    to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Comma-separated read replica URLs; reads use the primary when empty
+SQLALCHEMY_REPLICA_URLS = [
+    url.strip() for url in os.getenv("SQLALCHEMY_REPLICA_URLS", "").split(",") if url.strip()
+]
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Initialize the engine and base; pooling and SQLite PRAGMAs come from
+# the environment (see db/engine.py)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# The request path runs on the async engine; the sync engine above is kept
+# for schema creation and scripts.
+async_engine = create_async_db_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+read_router = ReplicaRouter(
+    primary=async_engine,
+    replicas=[create_async_db_engine(to_async_url(url)) for url in SQLALCHEMY_REPLICA_URLS],
+    health_check_seconds=REPLICA_HEALTH_CHECK_SECONDS,
+    read_your_writes_seconds=READ_YOUR_WRITES_SECONDS,
+)
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_write(session, _flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update \
+            or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def _record_client_write(session):
+    # Runs inside commit(), i.e. before the handler's response is sent, so the
+    # client's next read is already pinned to the primary.
+    if session.info.pop("wrote", False):
+        read_router.record_write(session.info.get("client_key"))
+
+def _client_key(request: Request):
+    return ReplicaRouter.client_key(request.headers.get("Authorization"),
+                                    request.client.host if request.client else None)
+
 def get_db():
     """Yields a new database session for request lifecycle management."""
     db = SessionLocal()
@@ -22,3 +84,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db(request: Request):
+    """Yields a new async database session on the primary for request lifecycle management."""
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info["client_key"] = _client_key(request)
+        yield db
+
+async def get_read_db(request: Request):
+    """
+    Yields a read-only async session on a healthy read replica, or on the
+    primary if there is none or the client has just written.
+    """
+    async with read_session(request) as db:
+        yield db
+
+def read_session(request: Request) -> AsyncSession:
+    """Opens an async session on the engine `read_router` picks for the request's client."""
+    return AsyncSessionLocal(bind=read_router.read_engine(_client_key(request)))
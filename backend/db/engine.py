@@ -0,0 +1,168 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+@dataclass(frozen=True)
+class PoolProfile:
+    """Connection pool settings, shared by every backend."""
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PoolProfile":
+        """Reads the DB_POOL_* environment variables."""
+        return cls(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+        )
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """
+    PRAGMAs applied to every new SQLite connection.
+
+    WAL lets readers proceed while a writer commits, synchronous=NORMAL is
+    durable in WAL mode while syncing far less often, and busy_timeout makes
+    concurrent writers wait for the lock instead of failing immediately.
+    foreign_keys enforces foreign keys and their ON DELETE actions, which
+    SQLite otherwise ignores.
+    """
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    temp_store: str = "MEMORY"
+    foreign_keys: bool = True
+
+    @classmethod
+    def from_env(cls) -> "SQLiteProfile":
+        """Reads the SQLITE_* environment variables."""
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+            cache_size_kib=int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024))),
+            temp_store=os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+            foreign_keys=_env_bool("SQLITE_FOREIGN_KEYS", True),
+        )
+
+    def pragmas(self):
+        """Returns the PRAGMA statements, in the order they are applied."""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size=-{self.cache_size_kib}",
+            f"PRAGMA temp_store={self.temp_store}",
+            f"PRAGMA foreign_keys={'ON' if self.foreign_keys else 'OFF'}",
+        ]
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in database
+
+def engine_options(url: str, pool: Optional[PoolProfile] = None, is_async: bool = False) -> dict:
+    """
+    Returns the `create_engine` keyword arguments of a database URL's profile.
+
+    Args:
+        url (str): The database URL.
+        pool (PoolProfile, optional): Pool settings; read from the environment if omitted.
+        is_async (bool): Whether the options are for an async engine.
+
+    Returns:
+        dict: Keyword arguments for `create_engine` / `create_async_engine`.
+    """
+    pool = pool or PoolProfile.from_env()
+    options = {}
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            # In-memory databases live in a single connection; keep the default pool
+            return options
+        # SQLite file databases may default to NullPool, which reopens (and
+        # re-applies every PRAGMA) per checkout. Pre-ping and recycle guard
+        # against dropped network connections, which a local file does not have.
+        options.update(poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+                       pool_size=pool.pool_size, max_overflow=pool.max_overflow,
+                       pool_timeout=pool.pool_timeout)
+        return options
+
+    options.update(
+        pool_size=pool.pool_size,
+        max_overflow=pool.max_overflow,
+        pool_timeout=pool.pool_timeout,
+        pool_recycle=pool.pool_recycle,
+        pool_pre_ping=pool.pool_pre_ping,
+    )
+    return options
+
+def apply_sqlite_profile(engine: Engine, profile: Optional[SQLiteProfile] = None):
+    """Runs the profile's PRAGMAs on every connection the engine opens."""
+    statements = (profile or SQLiteProfile.from_env()).pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+def create_db_engine(url: str,
+                     pool: Optional[PoolProfile] = None,
+                     sqlite: Optional[SQLiteProfile] = None) -> Engine:
+    """
+    Creates a sync engine tuned for the URL's backend.
+
+    Args:
+        url (str): The database URL.
+        pool (PoolProfile, optional): Pool settings; read from the environment if omitted.
+        sqlite (SQLiteProfile, optional): SQLite PRAGMAs; read from the environment if omitted.
+
+    Returns:
+        Engine: The configured engine.
+    """
+    engine = create_engine(url, **engine_options(url, pool))
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        apply_sqlite_profile(engine, sqlite)
+    return engine
+
+def create_async_db_engine(url: str,
+                           pool: Optional[PoolProfile] = None,
+                           sqlite: Optional[SQLiteProfile] = None) -> AsyncEngine:
+    """
+    Creates an async engine tuned for the URL's backend.
+
+    Args:
+        url (str): The async database URL.
+        pool (PoolProfile, optional): Pool settings; read from the environment if omitted.
+        sqlite (SQLiteProfile, optional): SQLite PRAGMAs; read from the environment if omitted.
+
+    Returns:
+        AsyncEngine: The configured engine.
+    """
+    engine = create_async_engine(url, **engine_options(url, pool, is_async=True))
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        apply_sqlite_profile(engine.sync_engine, sqlite)
+    return engine
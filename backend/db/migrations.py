@@ -0,0 +1,149 @@
+import logging
+from typing import Set
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import AddConstraint, CreateColumn, ForeignKeyConstraint
+from . import models
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+# Indexes of earlier versions that a newer index replaces
+OBSOLETE_INDEXES = {
+    "posts": ["ix_posts_user_id"],  # replaced by ix_posts_user_id_date_created_id
+}
+
+def upgrade_schema(engine: Engine):
+    """
+    Creates missing tables and brings tables created by earlier versions up
+    to date with the models. Every step checks the live schema first, so it
+    is safe to run on each start.
+
+    - Missing nullable columns are added (e.g. posts.enrichment_status).
+    - The foreign key of posts.user_id, with ON DELETE CASCADE, is added.
+      SQLite cannot add a constraint to a table, so there the table is
+      rebuilt. Posts whose author no longer exists are kept.
+    - Missing indexes are created, and indexes they replace are dropped. A
+      unique index that existing rows violate (e.g. usernames differing
+      only in case) is logged and skipped until the rows are fixed.
+
+    Args:
+        engine (Engine): The sync engine of the primary database.
+    """
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    _add_post_author_foreign_key(engine)
+    _create_missing_indexes(engine)
+
+def _add_missing_columns(engine: Engine):
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    raise RuntimeError(
+                        f"Cannot add the required column {table.name}.{column.name}; "
+                        "migrate this table by hand."
+                    )
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                logger.info("Added column %s.%s.", table.name, column.name)
+
+def _has_cascading_author_key(engine: Engine) -> bool:
+    for key in inspect(engine).get_foreign_keys("posts"):
+        if key["constrained_columns"] == ["user_id"] and key["referred_table"] == "users":
+            return (key.get("options") or {}).get("ondelete", "").upper() == "CASCADE"
+    return False
+
+def _add_post_author_foreign_key(engine: Engine):
+    if _has_cascading_author_key(engine):
+        return
+    if engine.dialect.name == "sqlite":
+        _rebuild_sqlite_table(engine, models.Post.__table__)
+    else:
+        constraint = next(key for key in models.Post.__table__.foreign_key_constraints
+                          if key.column_keys == ["user_id"])
+        with engine.begin() as conn:
+            for key in inspect(conn).get_foreign_keys("posts"):
+                if key["constrained_columns"] == ["user_id"] and key["name"]:
+                    conn.execute(text(f"ALTER TABLE posts DROP CONSTRAINT {key['name']}"))
+            ddl = str(AddConstraint(_named(constraint)).compile(dialect=engine.dialect))
+            if engine.dialect.name == "postgresql":
+                # Existing posts may reference deleted users; only check new rows
+                ddl += " NOT VALID"
+            conn.execute(text(ddl))
+    logger.info("Added the foreign key of posts.user_id.")
+
+def _named(constraint: ForeignKeyConstraint) -> ForeignKeyConstraint:
+    if constraint.name is None:
+        constraint.name = f"fk_{constraint.table.name}_{'_'.join(constraint.column_keys)}"
+    return constraint
+
+def _rebuild_sqlite_table(engine: Engine, table):
+    """
+    Recreates a SQLite table from its model and copies its rows over, the
+    way SQLite documents for schema changes ALTER TABLE cannot make.
+    Triggers on the table are dropped with it; the search backend's setup
+    recreates its own.
+    """
+    old_name = f"_{table.name}_old"
+    with engine.connect() as conn:
+        # Can only be switched outside of a transaction
+        enforced = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        try:
+            # pysqlite does not begin a transaction for DDL by itself
+            conn.exec_driver_sql("BEGIN")
+            inspector = inspect(conn)
+            columns = ", ".join(column["name"] for column in inspector.get_columns(table.name)
+                                if column["name"] in table.columns)
+            for name in _index_names(conn, table.name):
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+            table.create(conn)
+            conn.execute(text(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}"
+            ))
+            conn.execute(text(f"DROP TABLE {old_name}"))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if enforced else 'OFF'}")
+            conn.commit()
+
+def _index_names(conn, table_name: str) -> Set[str]:
+    if conn.dialect.name == "sqlite":
+        # The inspector skips expression indexes such as lower(username)
+        return set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table "
+            "AND name NOT LIKE 'sqlite_autoindex_%'"
+        ), {"table": table_name}).scalars())
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+def _create_missing_indexes(engine: Engine):
+    for table in Base.metadata.sorted_tables:
+        with engine.connect() as conn:
+            existing = _index_names(conn, table.name)
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    index.create(conn)
+                logger.info("Created index %s.", index.name)
+            except IntegrityError as exc:
+                logger.error("Could not create the unique index %s; existing rows "
+                             "violate it and must be fixed first: %s", index.name, exc.orig)
+        with engine.begin() as conn:
+            for name in OBSOLETE_INDEXES.get(table.name, []):
+                if name in existing:
+                    on_table = f" ON {table.name}" if engine.dialect.name == "mysql" else ""
+                    conn.execute(text(f"DROP INDEX {name}{on_table}"))
+                    logger.info("Dropped index %s.", name)
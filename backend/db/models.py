@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -13,15 +15,65 @@ class User(Base):
     icon = Column(String, nullable=True)
     date_created = Column(DateTime(timezone=True), server_default=func.now()) # pylint: disable=E1102
     google_login = Column(Boolean, default=False)  # Distinguish Google login users
+    # Google picture still to be fetched as the icon (see crud.users.fetch_user_avatar)
+    pending_avatar_url = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Usernames and emails are unique regardless of case; these also back
+        # the case-insensitive login lookup (see crud.users.get_user_by_login).
+        Index("ix_users_username_lower", func.lower(username), unique=True),
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
 
 class Post(Base):
     __tablename__ = "posts"
 
     id = Column(Integer, primary_key=True, index=True)
     pid = Column(String, unique=True, index=True, nullable=False)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     text = Column(String, nullable=False)
     title = Column(String, nullable=True)
     description = Column(String, nullable=True)
     image_url = Column(String, nullable=True)
-    date_created = Column(DateTime(timezone=True), server_default=func.now()) # pylint: disable=E1102
+    # Link preview state: None (no link), "pending", "done" or "failed"
+    enrichment_status = Column(String, nullable=True)
+    # Set client-side with microsecond precision so the feed order (and its
+    # keyset cursors) stays stable for posts created within the same second.
+    date_created = Column(DateTime(timezone=True),
+                          default=lambda: datetime.now(timezone.utc),
+                          server_default=func.now()) # pylint: disable=E1102
+
+    # Only populated when a query eager-loads it, so serializing a post never
+    # triggers a lazy load per row.
+    author = relationship("User", lazy="noload")
+
+    __table_args__ = (
+        # Backs the keyset pagination of the feed, newest first.
+        Index("ix_posts_date_created_pid", "date_created", "pid"),
+        # Backs user timelines (and any lookup by user_id), newest first.
+        Index("ix_posts_user_id_date_created_id", "user_id", "date_created", "id"),
+    )
+
+class LinkPreview(Base):
+    __tablename__ = "link_previews"
+
+    key = Column(String, primary_key=True)  # sha256 of the normalized URL
+    url = Column(String, nullable=False)
+    ok = Column(Boolean, nullable=False)  # False caches a failed fetch
+    title = Column(String, nullable=True)
+    description = Column(String, nullable=True)
+    image_url = Column(String, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+
+class IconBlob(Base):
+    __tablename__ = "icon_blobs"
+
+    hash = Column(String, primary_key=True)  # see core.icons.content_hash
+    # Users whose icon it is; -1 while the garbage collector deletes its files
+    refcount = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Backs the garbage collector's scan for unreferenced blobs.
+        Index("ix_icon_blobs_refcount_updated_at", "refcount", "updated_at"),
+    )
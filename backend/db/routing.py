@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from typing import List, Optional
+from cachetools import TTLCache
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+class ReplicaRouter:
+    """
+    Chooses the engine a read-only session runs on.
+
+    Reads are spread round-robin over the replicas that passed their last
+    health check and fall back to the primary when none did. A client that
+    committed a write within the last `read_your_writes_seconds` is pinned to
+    the primary so it never reads a replica that has not caught up yet.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: List[AsyncEngine],
+                 health_check_seconds: float, read_your_writes_seconds: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.health_check_seconds = health_check_seconds
+        self._healthy = list(replicas)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._recent_writers = TTLCache(maxsize=100_000, ttl=read_your_writes_seconds,
+                                        timer=time.monotonic)
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def client_key(authorization: Optional[str], host: Optional[str]) -> Optional[str]:
+        """Identifies a client by its bearer token, or by its address when anonymous."""
+        if authorization:
+            return hashlib.sha256(authorization.encode()).hexdigest()
+        return host
+
+    def read_engine(self, client_key: Optional[str]) -> AsyncEngine:
+        """Returns the engine the next read-only session of a client should use."""
+        with self._lock:
+            if client_key is not None and client_key in self._recent_writers:
+                return self.primary
+        healthy = self._healthy
+        if not healthy:
+            return self.primary
+        return healthy[next(self._counter) % len(healthy)]
+
+    def record_write(self, client_key: Optional[str]):
+        """Pins a client's reads to the primary for the read-your-writes window."""
+        if client_key is None or not self.replicas:
+            return
+        with self._lock:
+            self._recent_writers[client_key] = True
+
+    async def start(self):
+        """Runs a first health check and schedules periodic ones."""
+        if not self.replicas:
+            return
+        await self.check_health()
+        self._task = asyncio.create_task(self._health_loop(), name="replica-health")
+
+    async def stop(self):
+        """Stops the health checks and closes the replica pools."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    async def check_health(self):
+        """Probes every replica with `SELECT 1` and updates the healthy set."""
+        results = await asyncio.gather(*(self._probe(replica) for replica in self.replicas))
+        healthy = [replica for replica, ok in zip(self.replicas, results) if ok]
+        if len(healthy) != len(self._healthy):
+            logger.warning("%d of %d read replicas healthy.", len(healthy), len(self.replicas))
+        self._healthy = healthy
+
+    async def _probe(self, replica: AsyncEngine) -> bool:
+        try:
+            async with asyncio.timeout(self.health_check_seconds):
+                async with replica.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            return True
+        except Exception as exc: # pylint: disable=W0718
+            logger.error("Read replica %s failed its health check: %s",
+                         replica.url.render_as_string(hide_password=True), exc)
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_seconds)
+            await self.check_health()
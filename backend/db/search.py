@@ -0,0 +1,119 @@
+import re
+from typing import List, Optional
+from sqlalchemy import Float, Integer, text
+from sqlalchemy.engine import Engine
+from .database import engine as primary_engine
+
+# At most this many words of a query are used
+MAX_QUERY_TERMS = 8
+
+def query_terms(query: str) -> List[str]:
+    """
+    Splits a user query into lowercase words, dropping every operator and
+    quote so the input can never form query syntax of its own.
+    """
+    return re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+
+class SQLiteSearchBackend:
+    """
+    Full-text search on an FTS5 table that indexes the text, title and
+    description of posts. It is an external-content table over `posts`, kept
+    in sync by triggers, so the text is stored only once.
+    """
+
+    name = "sqlite"
+
+    def setup(self, engine: Engine):
+        """Creates the index and its triggers if missing, indexing existing posts."""
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+            )).first()
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+                "text, title, description, content='posts', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN "
+                "INSERT INTO posts_fts(rowid, text, title, description) "
+                "VALUES (new.id, new.text, new.title, new.description); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN "
+                "INSERT INTO posts_fts(posts_fts, rowid, text, title, description) "
+                "VALUES ('delete', old.id, old.text, old.title, old.description); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS posts_fts_update "
+                "AFTER UPDATE OF text, title, description ON posts BEGIN "
+                "INSERT INTO posts_fts(posts_fts, rowid, text, title, description) "
+                "VALUES ('delete', old.id, old.text, old.title, old.description); "
+                "INSERT INTO posts_fts(rowid, text, title, description) "
+                "VALUES (new.id, new.text, new.title, new.description); END"
+            ))
+            if not exists:
+                conn.execute(text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+
+    def matches(self, terms: List[str]):
+        """
+        Returns a subquery of the matching post ids and their rank, lower is
+        better. Every term must match as a word prefix; titles weigh twice as
+        much as text and descriptions.
+        """
+        match = " ".join(f'"{term}"*' for term in terms)
+        return text(
+            "SELECT rowid AS id, bm25(posts_fts, 1.0, 2.0, 1.0) AS rank "
+            "FROM posts_fts WHERE posts_fts MATCH :match"
+        ).bindparams(match=match).columns(id=Integer, rank=Float).subquery("matches")
+
+class PostgresSearchBackend:
+    """
+    Full-text search on a generated `tsvector` column of posts with a GIN
+    index, weighting titles above text and descriptions.
+    """
+
+    name = "postgresql"
+
+    def setup(self, engine: Engine):
+        """Adds the column and its index if missing; Postgres fills the column itself."""
+        with engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                "GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(text, '')), 'B') || "
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+                ") STORED"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_posts_search_vector "
+                "ON posts USING GIN (search_vector)"
+            ))
+
+    def matches(self, terms: List[str]):
+        """
+        Returns a subquery of the matching post ids and their rank, lower is
+        better. Every term must match as a word prefix.
+        """
+        query = " & ".join(f"{term}:*" for term in terms)
+        return text(
+            "SELECT id, -ts_rank_cd(search_vector, query) AS rank "
+            "FROM posts, to_tsquery('simple', :query) AS query "
+            "WHERE search_vector @@ query"
+        ).bindparams(query=query).columns(id=Integer, rank=Float).subquery("matches")
+
+def create_search_backend(engine: Engine) -> Optional[object]:
+    """
+    Returns the search backend for an engine's database, or None if full-text
+    search is not supported on it.
+    """
+    backends = {
+        SQLiteSearchBackend.name: SQLiteSearchBackend,
+        PostgresSearchBackend.name: PostgresSearchBackend,
+    }
+    backend = backends.get(engine.dialect.name)
+    return backend() if backend else None
+
+# None when the database has no full-text search support
+search_backend = create_search_backend(primary_engine)
@@ -1,19 +1,61 @@
-import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from .core.thlogging import configure_logging
-from .core.config import setup_cors
-from .routers import users, auth, posts
-from .db import Base, engine
+from .core.cache_backend import cache_backend
+from .core.config import setup_cors, initialize_firebase
+from .core.firebase_tokens import firebase_signing_keys
+from .core.http import http_client
+from .core.icon_storage import ICON_DIR, IconStaticFiles
+from .core.icons import icon_processor
+from .core.password_hasher import password_hasher
+from .core.serialization import FastJSONResponse
+from .routers import users, auth, posts, metrics
+from .crud import posts as crud_posts, users as crud_users
+from .crud.icons import icon_collector
+from .db import engine, async_engine
+from .db.database import read_router
+from .db.migrations import upgrade_schema
+from .db.search import search_backend
 
 # Configure logging
 configure_logging()
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Starts and stops the shared clients and background workers with the application."""
+    initialize_firebase()
+    await http_client.start()
+    await read_router.start()
+    await firebase_signing_keys.start()
+    await crud_posts.enrichment_queue.start()
+    await crud_posts.feed_refresh_queue.start()
+    await crud_users.avatar_queue.start()
+    await crud_posts.post_events.start()
+    await crud_posts.requeue_pending_enrichments()
+    await crud_users.requeue_pending_avatars()
+    await icon_collector.start()
+    yield
+    await icon_collector.stop()
+    await crud_posts.post_events.stop()
+    await crud_posts.enrichment_queue.stop()
+    await crud_posts.feed_refresh_queue.stop()
+    await crud_users.avatar_queue.stop()
+    await firebase_signing_keys.stop()
+    await http_client.close()
+    password_hasher.shutdown()
+    icon_processor.shutdown()
+    await read_router.stop()
+    await cache_backend.close()
+    await async_engine.dispose()
+
 # Create FastAPI app instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables, bring tables of earlier versions up to date, and
+# create the full-text search index
+upgrade_schema(engine)
+if search_backend is not None:
+    search_backend.setup(engine)
 
 # Initialize configurations
 setup_cors(app)
@@ -22,7 +64,7 @@ setup_cors(app)
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(posts.router, prefix="/posts", tags=["posts"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
-# Mount the static images directory at "/icons"
-static_icons_dir = os.path.join(os.path.dirname(__file__), "static", "icons")
-app.mount("/icons", StaticFiles(directory=static_icons_dir), name="icons")
+# Mount the static images directory at "/icons", served with long-lived cache headers
+app.mount("/icons", IconStaticFiles(directory=ICON_DIR), name="icons")
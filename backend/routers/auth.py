@@ -1,19 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from ..core import auth
-from ..core.utils import download_user_icon
 from ..crud import users as crud_users
-from ..db.database import get_db
+from ..db.database import get_async_db
 from ..schemas.users import UserCreate
 from ..schemas.auth import TokenPair, LoginRequest
 
 router = APIRouter()
 
 @router.post("/login", response_model=TokenPair)
-def login(
+async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Endpoint for user login with either Firebase token or credentials.
 
@@ -25,20 +24,20 @@ def login(
         dict: Access and refresh tokens with token type.
     """
     if login_data.token:  # Google login
-        google_user_data = auth.verify_firebase_token(login_data.token)
-        user = crud_users.get_user_by_email(db, google_user_data["email"])
+        google_user_data = await auth.verify_firebase_token(login_data.token)
+        user = await crud_users.get_user_by_email(db, google_user_data["email"])
         google_picture_url = google_user_data.get("picture")
 
         if not user:
-            icon_path = download_user_icon(google_picture_url,
-                                           google_user_data["uid"]) \
-                                            if google_picture_url else None
+            # The user starts without an icon; the avatar is fetched in the background
             new_user_data = UserCreate(
                 username=google_user_data["name"],
                 email=google_user_data["email"],
-                icon=icon_path
             )
-            user = crud_users.create_user(db, user=new_user_data, google_login=True)
+            user = await crud_users.create_user(db, user=new_user_data, google_login=True,
+                                                pending_avatar_url=google_picture_url)
+            if google_picture_url:
+                crud_users.submit_avatar_fetch(user.id, google_picture_url)
 
         # Generate access and refresh tokens
         access_token = auth.create_access_token(data={"sub": user.email})
@@ -50,10 +49,9 @@ def login(
         }
 
     elif login_data.username and login_data.password:  # Standard login
-        user = crud_users.get_user_by_username(db, login_data.username) or \
-               crud_users.get_user_by_email(db, login_data.username)
+        user = await crud_users.get_user_by_login(db, login_data.username)
 
-        if not user or not auth.verify_password(login_data.password, user.password):
+        if not user or not await auth.verify_password_async(login_data.password, user.password):
             raise HTTPException(
                 status_code=400,
                 detail={
@@ -76,12 +74,12 @@ def login(
     })
 
 @router.post("/refresh", response_model=TokenPair)
-def refresh_token(token: str, db: Session = Depends(get_db)):
+async def refresh_token(token: str, db: AsyncSession = Depends(get_async_db)):
     """Refreshes the access token using a valid refresh token.
 
     Args:
         token (str): Refresh token to validate.
-        db (Session): Database session dependency.
+        db (AsyncSession): Database session dependency.
 
     Raises:
         HTTPException: If the refresh token is invalid.
@@ -100,7 +98,7 @@ def refresh_token(token: str, db: Session = Depends(get_db)):
                     "message": "Invalid refresh token."
                 })
 
-        user = crud_users.get_user_by_email(db, email)
+        user = await crud_users.get_user_by_email(db, email)
         if user is None:
             raise HTTPException(
                 status_code=401,
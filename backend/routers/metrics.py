@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from ..core.metrics import metrics
+
+router = APIRouter()
+
+@router.get("/")
+def get_metrics():
+    """Retrieve the in-process counters and timing summaries of this worker."""
+    return metrics.snapshot()
@@ -1,41 +1,141 @@
-from typing import List
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas import posts as post_schemas
-from ..db import models
-from ..db.database import get_db
+from ..db.database import get_async_db, get_read_db, read_router
 from ..crud import posts as crud_posts
 from ..crud.users import get_current_user
+from ..core.user_cache import UserSnapshot
+from ..core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..core.conditional import change_versions, check_not_modified
+from ..core.feed_cache import feed_cache
+from ..core.serialization import FastJSONResponse
+from ..core.streaming import stream_export
 
 
 router = APIRouter()
 
 @router.post("/", response_model=post_schemas.PostResponse)
-def create_post(
+async def create_post(
     post: post_schemas.PostCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """
     Endpoint to create a new post. Authenticated users only.
 
     Args:
         post (PostCreate): The post creation schema.
-        db (Session): Database session dependency.
-        current_user (models.User): The authenticated user from JWT.
+        db (AsyncSession): Database session dependency.
+        current_user (UserSnapshot): The authenticated user from JWT.
 
     Returns:
         PostResponse: The created post.
     """
-    return crud_posts.create_post(db=db, post=post, user_id=current_user.id)
+    return await crud_posts.create_post(db=db, post=post, user_id=current_user.id)
 
 
-@router.get("/", response_model=List[post_schemas.PostResponse])
-def get_all_posts(db: Session = Depends(get_db)):
+@router.get("/", response_model=post_schemas.PostPage)
+async def get_all_posts(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_author: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve one page of the feed, newest first.
+
+    Args:
+        cursor (str, optional): The `next_cursor` of the previous page.
+        limit (int): The maximum number of posts to return.
+        include_author (bool): Embed each post's author summary, saving a
+            separate /users/batch call.
+
+    Returns:
+        PostPage: The posts of the page and the cursor of the next page, or an
+        empty 304 if the client's If-None-Match is still current.
+    """
+    tag = await change_versions.tag(*crud_posts.feed_tables(include_author))
+    not_modified, headers = check_not_modified(request, tag)
+    if not_modified:
+        return not_modified
+
+    # First pages are kept pre-encoded; other pages are rendered per request
+    body = await feed_cache.get(limit, include_author, tag) if cursor is None else None
+    if body is None:
+        body = await crud_posts.render_feed_page(db, cursor=cursor, limit=limit,
+                                                 include_author=include_author)
+        if db.bind is not read_router.primary:
+            # A replica may lag behind the tag: the page is neither cached nor
+            # sent with an ETag a client would revalidate it by
+            del headers["ETag"]
+        elif cursor is None:
+            await feed_cache.put(limit, include_author, tag, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+@router.get("/search", response_model=post_schemas.PostPage)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_author: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Retrieve a list of all posts in the database.
+    Full-text search over the text, title and description of posts.
+
+    Args:
+        q (str): The search words; each must match the start of a word.
+        cursor (str, optional): The `next_cursor` of the previous page.
+        limit (int): The maximum number of posts to return.
+        include_author (bool): Embed each post's author summary.
+
+    Returns:
+        PostPage: The matching posts, best match first, and the cursor of the next page.
+    """
+    posts, next_cursor = await crud_posts.search_posts(db, q, cursor=cursor, limit=limit,
+                                                       include_author=include_author)
+    return FastJSONResponse({"items": posts, "next_cursor": next_cursor})
+
+@router.get("/export", response_class=StreamingResponse,
+            responses={200: {"content": {"application/json": {}, "application/x-ndjson": {}}}})
+async def export_posts(
+    request: Request,
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
+    """
+    Stream every post, newest first, without loading the table into memory.
+
+    Args:
+        fmt (str): "json" for a JSON array of PostResponse objects, or "ndjson"
+            for one object per line.
+
+    Returns:
+        StreamingResponse: The streamed posts.
+    """
+    return stream_export(request, crud_posts.stream_all_posts, fmt)
+
+@router.get("/stream", response_class=StreamingResponse,
+            responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_posts(last_event_id: Optional[str] = Header(None)):
+    """
+    Live feed as Server-Sent Events: `post.created` when a post is created
+    and `post.enriched` when its link preview is resolved, each carrying the
+    post (without its author). Heartbeat comments keep idle connections open.
+
+    Args:
+        last_event_id (str, optional): Sent by EventSource on reconnect; the
+            events missed since are replayed first, or a `reset` event is sent
+            if they are no longer available.
 
     Returns:
-        List[PostResponse]: A list of posts.
+        StreamingResponse: The event stream.
     """
-    return crud_posts.get_all_posts(db)
+    subscription = crud_posts.post_events.subscribe(last_event_id)
+    return StreamingResponse(
+        crud_posts.post_events.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
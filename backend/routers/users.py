@@ -1,96 +1,165 @@
-from typing import List
+from typing import List, Optional
 from fastapi import (
     APIRouter,
     BackgroundTasks,
     Body,
     Depends,
     HTTPException,
-    UploadFile,
-    File
+    Query,
+    Request
 )
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt
 from ..schemas import users as user_schemas
-from ..crud import users as crud_users
+from ..schemas.posts import PostPage
+from ..crud import posts as crud_posts, users as crud_users
 from ..crud.users import get_current_user
 from ..core import auth, utils
-from ..db import models
-from ..db.database import get_db
+from ..core.conditional import change_versions, check_not_modified
+from ..core.icons import ICON_MAX_BYTES
+from ..core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..core.serialization import FastJSONResponse
+from ..core.streaming import stream_export
+from ..core.uploads import receive_file
+from ..core.user_cache import UserSnapshot, current_user_cache
+from ..db.database import get_async_db, get_read_db, read_router
 
 router = APIRouter()
 
 @router.post("/", response_model=user_schemas.UserResponse)
-def create_user(user: user_schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: user_schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new user in the database."""
-    if crud_users.get_user_by_username(db, user.username) \
-            or crud_users.get_user_by_email(db, user.email):
-        raise HTTPException(status_code=400, detail="Username or email already registered.")
-    return crud_users.create_user(db, user)
+    return await crud_users.create_user(db, user)
 
 @router.get("/", response_model=List[user_schemas.UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
-    """Retrieve a list of all users in the database."""
-    return crud_users.get_all_users(db)
+async def get_all_users(request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Retrieve a list of all users in the database. Honors If-None-Match."""
+    not_modified, headers = check_not_modified(request, await change_versions.tag("users"),
+                                               fresh=db.bind is read_router.primary)
+    if not_modified:
+        return not_modified
+    # Rows already have the UserResponse shape; returning a response skips re-validating them
+    return FastJSONResponse(await crud_users.get_all_users(db), headers=headers)
+
+@router.get("/export", response_class=StreamingResponse,
+            responses={200: {"content": {"application/json": {}, "application/x-ndjson": {}}}})
+async def export_users(
+    request: Request,
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
+    """
+    Stream every user without loading the table into memory.
+
+    `format=json` returns a JSON array of UserResponse objects and
+    `format=ndjson` one object per line.
+    """
+    return stream_export(request, crud_users.stream_all_users, fmt)
 
 @router.post("/batch", response_model=List[user_schemas.UserResponse])
-def batch_get_users(user_ids: List[int] = Body(...), db: Session = Depends(get_db)):
-    """Retrieve multiple users by their IDs."""
-    users = crud_users.get_users_by_ids(db, user_ids)
-    return users
+async def batch_get_users(request: Request,
+                          user_ids: List[int] = Body(...),
+                          db: AsyncSession = Depends(get_read_db)):
+    """
+    Retrieve multiple users by their IDs. This is a read, so a matching
+    If-None-Match is answered with 304 like on GET.
+    """
+    not_modified, headers = check_not_modified(
+        request, await change_versions.tag("users"), variant=",".join(map(str, user_ids)),
+        fresh=db.bind is read_router.primary)
+    if not_modified:
+        return not_modified
+    users = await crud_users.get_users_by_ids(db, user_ids)
+    return FastJSONResponse(users, headers=headers)
 
 @router.get("/me", response_model=user_schemas.UserResponse)
-def read_current_user(current_user: \
-                      user_schemas.UserResponse = Depends(crud_users.get_current_user)):
+async def read_current_user(current_user: \
+                      UserSnapshot = Depends(crud_users.get_current_user)):
     """Retrieves the currently authenticated user."""
     return current_user
 
 @router.get("/{user_id}", response_model=user_schemas.UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """Update an existing user's details."""
-    return crud_users.get_user_by_id(db, user_id)
+    return await crud_users.get_user_by_id(db, user_id)
+
+@router.get("/{user_id}/posts", response_model=PostPage)
+async def get_user_posts(
+    request: Request,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Retrieve one page of a user's posts, newest first. Honors If-None-Match."""
+    not_modified, headers = check_not_modified(
+        request, await change_versions.tag("posts"), variant=f"{user_id}?{request.url.query}",
+        fresh=db.bind is read_router.primary)
+    if not_modified:
+        return not_modified
+    posts, next_cursor = await crud_posts.get_user_posts_page(db, user_id, cursor=cursor,
+                                                              limit=limit)
+    return FastJSONResponse({"items": posts, "next_cursor": next_cursor}, headers=headers)
 
 @router.put("/{user_id}", response_model=user_schemas.UserResponse)
-def update_user(user_id: int, user_update: user_schemas.UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user_update: user_schemas.UserUpdate,
+                      db: AsyncSession = Depends(get_async_db)):
     """Update an existing user's details."""
-    return crud_users.update_user(db, user_id, user_update)
+    return await crud_users.update_user(db, user_id, user_update)
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete an existing user from the database. This is a hard delete."""
-    crud_users.delete_user(db, user_id)
+    await crud_users.delete_user(db, user_id)
     return "User deleted successfully"
 
-@router.put("/{user_id}/icon")
-def upload_icon(
+# The body is read by `receive_file`, not declared as a parameter, so it is documented here
+ICON_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+@router.put("/{user_id}/icon", openapi_extra=ICON_UPLOAD_BODY)
+async def upload_icon(
     user_id: int,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
-    """Upload or replace a user's profile icon."""
+    """
+    Upload or replace a user's profile icon.
+
+    The file is streamed in with a size cap, after authentication, so an
+    unauthenticated or oversized upload is never read in full.
+    """
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    return crud_users.update_user_icon(
-        db=db,
-        user_id=user_id,
-        file=file,
-        background_tasks=background_tasks,
-    )
+    file = await receive_file(request, "file", ICON_MAX_BYTES, metric="icons.upload")
+    return await crud_users.update_user_icon(db=db, user_id=user_id, file=file)
 
 @router.post("/request-password-reset")
-def request_password_reset(
+async def request_password_reset(
     payload: user_schemas.PasswordResetRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Request a password reset by sending a reset link to the user's email. 
     Relies on a utility function tied to a specific smtp service, eg AWS SES.
     See GH for details.
     """
-    user = crud_users.get_user_by_email(db, email=payload.email)
+    user = await crud_users.get_user_by_email(db, email=payload.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
@@ -103,9 +172,9 @@ def request_password_reset(
     return "Password reset email sent."
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     payload: user_schemas.PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Reset a user's password using a token for validation."""
     try:
@@ -116,26 +185,27 @@ def reset_password(
         raise HTTPException(status_code=400, detail="Invalid or expired token.") from exc
 
     # Verify that the email and user_uid match
-    user = crud_users.get_user_by_email(db, email=payload.email)
+    user = await crud_users.get_user_by_email(db, email=payload.email)
     if not user or str(user.uid) != user_uid:
         raise HTTPException(status_code=404,
                             detail="User not found, or email does not match token.")
 
-    user.password = auth.hash_password(payload.new_password)
-    db.commit()
+    user.password = await auth.hash_password_async(payload.new_password)
+    await db.commit()
+    current_user_cache.invalidate(user.id)
     return {
         "code": "AUTH_004",
         "message": "Password reset successfully",
     }
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     request: user_schemas.PasswordChange,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Endpoint to update the password for the authenticated user."""
-    updated_user = crud_users.update_password(
+    updated_user = await crud_users.update_password(
         db=db,
         user_id=current_user.id,
         new_password=request.new_password
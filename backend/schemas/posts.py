@@ -1,10 +1,25 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, computed_field
+from ..core.icons import icon_variants
 
 class PostCreate(BaseModel):
     text: str
 
+class AuthorSummary(BaseModel):
+    id: int
+    uid: str
+    username: str
+    icon: Optional[str]
+
+    @computed_field
+    @property
+    def icon_variants(self) -> Optional[Dict[str, str]]: # pylint: disable=C0116
+        return icon_variants(self.icon)
+
+    class Config:
+        from_attributes = True
+
 class PostResponse(BaseModel):
     id: int
     pid: str
@@ -13,7 +28,13 @@ class PostResponse(BaseModel):
     title: Optional[str]
     description: Optional[str]
     image_url: Optional[str]
+    enrichment_status: Optional[str] = None
     date_created: datetime
+    author: Optional[AuthorSummary] = None
 
     class Config:
         from_attributes = True
+
+class PostPage(BaseModel):
+    items: List[PostResponse]
+    next_cursor: Optional[str] = None
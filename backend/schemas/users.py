@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
-from pydantic import BaseModel, EmailStr, Field, model_validator
+from pydantic import BaseModel, EmailStr, Field, computed_field, model_validator
+from ..core.icons import icon_variants
 
 class PasswordValidationMixin:
     """Mixin to add password validation logic."""
@@ -34,10 +35,6 @@ class UserCreate(BaseModel, PasswordValidationMixin):
             "at least one letter and one number. Required unless using external authentication."
         )
     )
-    icon: Optional[str] = Field(
-        None,
-        description="Optional URL of the user's profile icon or avatar."
-    )
 
     @model_validator(mode="before")
     def validate_fields(cls, values): # pylint: disable=C0116, E0213
@@ -101,10 +98,6 @@ class UserUpdate(BaseModel):
         None,
         description="The updated email address. Must be unique."
     )
-    icon: Optional[str] = Field(
-        None,
-        description="Optional updated URL of the user's profile icon or avatar."
-    )
 
 
 class UserResponse(BaseModel):
@@ -133,5 +126,10 @@ class UserResponse(BaseModel):
         description="The timestamp when the user was created."
     )
 
+    @computed_field(description="The URL of each icon size, keyed by edge length in pixels.")
+    @property
+    def icon_variants(self) -> Optional[Dict[str, str]]: # pylint: disable=C0116
+        return icon_variants(self.icon)
+
     class Config:
         from_attributes = True
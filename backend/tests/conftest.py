@@ -0,0 +1,70 @@
+"""
+Shared fixtures of the backend tests. Install the test dependencies with
+`pip install -r backend/requirements-dev.txt` and run them from the
+repository root with `python -m pytest backend/tests`.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+# The app reads its settings when imported, and logs to application.log in
+# the working directory: point both at a scratch directory first
+_scratch = tempfile.mkdtemp(prefix="thgirraf-tests-")
+os.chdir(_scratch)
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{_scratch}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+# pylint: disable=C0413
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from backend.core.password_hasher import password_hasher
+from backend.db import async_engine
+from backend.main import app
+
+class QueryCounter:
+    """Counts the statements an engine sends to the database."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.statements = []
+
+    def _record(self, _conn, _cursor, statement, *_args):
+        self.statements.append(statement)
+
+    @contextmanager
+    def count(self):
+        """Collects the statements executed inside the block into `statements`."""
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def report(self) -> str:
+        """Returns the collected statements, one per line, for assertion messages."""
+        return "\n".join(" ".join(statement.split()) for statement in self.statements)
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # One event loop for the whole session, which the pooled connections belong to
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+async def client(anyio_backend): # pylint: disable=W0613,W0621
+    """
+    An HTTP client calling the app in-process. The lifespan is not run, so
+    no background workers or Firebase credentials are needed.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as session:
+        yield session
+    await async_engine.dispose()
+    password_hasher.shutdown()
+
+@pytest.fixture
+def query_counter() -> QueryCounter:
+    """Counts the statements sent to the primary database."""
+    return QueryCounter(async_engine)
@@ -0,0 +1,112 @@
+"""Firebase ID token verification against a local stand-in key set."""
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+from backend.core.firebase_tokens import (
+    FIREBASE_CLOCK_SKEW_SECONDS,
+    FirebaseTokenVerifier,
+    InvalidFirebaseToken,
+    SigningKeys,
+)
+from backend.core.metrics import metrics
+
+pytestmark = pytest.mark.anyio
+
+PROJECT_ID = "demo-project"
+KEY_ID = "test-key"
+
+@pytest.fixture(scope="module")
+def signing_key():
+    """An RSA key and a self-signed certificate for it, as Google publishes them."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(serialization.Encoding.PEM,
+                                    serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    return (crypt.RSASigner.from_string(private_pem, key_id=KEY_ID),
+            certificate.public_bytes(serialization.Encoding.PEM).decode())
+
+@pytest.fixture
+def verifier(signing_key):
+    keys = SigningKeys("http://keys.invalid")
+    keys.set_certs({KEY_ID: signing_key[1]})
+    return FirebaseTokenVerifier(keys, project_id=PROJECT_ID, cache_size=100)
+
+@pytest.fixture
+def issue(signing_key):
+    """Signs a token with valid claims, overridden by the keyword arguments."""
+    def _issue(**overrides) -> bytes:
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+            "aud": PROJECT_ID,
+            "sub": "firebase-user",
+            "iat": now,
+            "auth_time": now,
+            "exp": now + 3600,
+            "email": "user@example.com",
+        }
+        claims.update(overrides)
+        return google_jwt.encode(signing_key[0], claims).decode()
+    return _issue
+
+def _counter(name: str) -> int:
+    return metrics.snapshot()["counters"].get(name, 0)
+
+async def test_verifies_token(verifier, issue):
+    claims = await verifier.verify(issue())
+    assert claims["uid"] == "firebase-user"
+    assert claims["email"] == "user@example.com"
+
+async def test_caches_claims_until_expiry(verifier, issue):
+    token = issue(exp=int(time.time()) + 1)
+    misses = _counter("firebase.token.cache_miss")
+    hits = _counter("firebase.token.cache_hit")
+
+    await verifier.verify(token)
+    await verifier.verify(token)
+    assert _counter("firebase.token.cache_miss") == misses + 1
+    assert _counter("firebase.token.cache_hit") == hits + 1
+
+    time.sleep(1.1)
+    # Past `exp` the entry is gone; the token is checked again (and still
+    # accepted within the clock skew allowance)
+    await verifier.verify(token)
+    assert _counter("firebase.token.cache_miss") == misses + 2
+
+async def test_returns_a_copy_of_cached_claims(verifier, issue):
+    token = issue()
+    claims = await verifier.verify(token)
+    claims["uid"] = "someone-else"
+    assert (await verifier.verify(token))["uid"] == "firebase-user"
+
+@pytest.mark.parametrize("overrides", [
+    {"iss": "https://securetoken.google.com/other-project"},
+    {"aud": "other-project"},
+    {"auth_time": int(time.time()) + FIREBASE_CLOCK_SKEW_SECONDS + 600},
+    {"sub": ""},
+    {"exp": int(time.time()) - FIREBASE_CLOCK_SKEW_SECONDS - 60},
+], ids=["issuer", "audience", "future-auth-time", "empty-subject", "expired"])
+async def test_rejects_invalid_claims(verifier, issue, overrides):
+    with pytest.raises(InvalidFirebaseToken):
+        await verifier.verify(issue(**overrides))
+
+async def test_rejects_unknown_signing_key(verifier, issue):
+    verifier.keys.set_certs({})
+    with pytest.raises(InvalidFirebaseToken):
+        await verifier.verify(issue())
@@ -0,0 +1,79 @@
+"""Icon storage backends, with S3 replaced by a stubbed client."""
+import pytest
+from botocore.stub import Stubber
+from backend.core import icons
+from backend.core.icon_storage import IMMUTABLE_CACHE_CONTROL, LocalIconStorage, S3IconStorage
+from backend.crud import icons as crud_icons
+
+pytestmark = pytest.mark.anyio
+
+BUCKET = "icons-bucket"
+HASHED_ICON = icons.blob_files("ab" * 32)[-1]
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    """An S3 storage under the prefix "avatars/", whose client answers from a stub."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    storage = S3IconStorage(BUCKET, prefix="avatars/", endpoint_url="http://s3.invalid",
+                            public_url="https://cdn.example.com")
+    with Stubber(storage._client) as stubber: # pylint: disable=W0212
+        yield storage, stubber
+        stubber.assert_no_pending_responses()
+
+async def test_s3_exists(s3_storage):
+    storage, stubber = s3_storage
+    stubber.add_response("head_object", {}, {"Bucket": BUCKET, "Key": "avatars/a.webp"})
+    stubber.add_client_error("head_object", service_error_code="404", http_status_code=404,
+                             expected_params={"Bucket": BUCKET, "Key": "avatars/b.webp"})
+    assert await storage.exists("a.webp")
+    assert not await storage.exists("b.webp")
+
+async def test_s3_write(s3_storage):
+    storage, stubber = s3_storage
+    for name, data in (("ab/cd/x-48.webp", b"small"), ("ab/cd/x-256.webp", b"large")):
+        stubber.add_response("put_object", {}, {
+            "Bucket": BUCKET, "Key": f"avatars/{name}", "Body": data,
+            "ContentType": "image/webp", "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        })
+    await storage.write({"ab/cd/x-48.webp": b"small", "ab/cd/x-256.webp": b"large"})
+
+async def test_s3_delete(s3_storage):
+    storage, stubber = s3_storage
+    stubber.add_response("delete_objects", {}, {
+        "Bucket": BUCKET,
+        "Delete": {"Objects": [{"Key": "avatars/a.webp"}, {"Key": "avatars/b.webp"}],
+                   "Quiet": True},
+    })
+    await storage.delete(["a.webp", "b.webp"])
+    await storage.delete([])
+
+def test_s3_url(s3_storage):
+    storage, _ = s3_storage
+    assert storage.url("ab/cd/x-48.webp") == "https://cdn.example.com/avatars/ab/cd/x-48.webp"
+
+def test_legacy_icons_are_served_locally(s3_storage, monkeypatch):
+    storage, _ = s3_storage
+    monkeypatch.setattr(icons, "icon_storage", storage)
+    assert set(icons.icon_variants("legacy.png").values()) == {"/icons/legacy.png"}
+    assert icons.icon_variants(HASHED_ICON)[str(icons.ICON_SIZES[-1])] \
+        == f"https://cdn.example.com/avatars/{HASHED_ICON}"
+
+async def test_legacy_icons_are_deleted_locally(s3_storage, monkeypatch, tmp_path):
+    storage, _ = s3_storage
+    (tmp_path / "legacy.png").write_bytes(b"icon")
+    monkeypatch.setattr(crud_icons, "icon_storage", storage)
+    monkeypatch.setattr(crud_icons, "local_icon_storage", LocalIconStorage(tmp_path))
+    # The stub fails the test on any call to S3
+    await crud_icons.release_icon("legacy.png")
+    assert not (tmp_path / "legacy.png").exists()
+
+@pytest.mark.parametrize("name", ["../outside.webp", "ab/../../outside.webp", "/etc/passwd", "."])
+async def test_local_rejects_names_outside_root(tmp_path, name):
+    storage = LocalIconStorage(tmp_path / "icons")
+    with pytest.raises(ValueError):
+        await storage.write({name: b"data"})
+    with pytest.raises(ValueError):
+        await storage.exists(name)
+    assert not (tmp_path / "outside.webp").exists()
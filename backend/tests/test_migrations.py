@@ -0,0 +1,57 @@
+"""Upgrades of databases created by earlier versions of the models."""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from backend.db.migrations import upgrade_schema
+
+# The users and posts tables as the first release created them
+BASELINE_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, uid VARCHAR NOT NULL UNIQUE, "
+    "username VARCHAR NOT NULL UNIQUE, email VARCHAR NOT NULL UNIQUE, password VARCHAR, "
+    "icon VARCHAR, date_created DATETIME DEFAULT CURRENT_TIMESTAMP, google_login BOOLEAN)",
+    "CREATE TABLE posts (id INTEGER PRIMARY KEY, pid VARCHAR NOT NULL UNIQUE, "
+    "user_id INTEGER NOT NULL, text VARCHAR NOT NULL, title VARCHAR, description VARCHAR, "
+    "image_url VARCHAR, date_created DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "INSERT INTO users (id, uid, username, email) VALUES (1, 'u1', 'alice', 'alice@example.com')",
+    "INSERT INTO posts (pid, user_id, text) VALUES ('p1', 1, 'hello'), ('p2', 42, 'orphan')",
+]
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+    yield engine
+    engine.dispose()
+
+def _index_names(engine, table):
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+        ), {"table": table}).scalars())
+
+def test_upgrade_is_repeatable(baseline_engine):
+    upgrade_schema(baseline_engine)
+    upgrade_schema(baseline_engine)
+
+    inspector = inspect(baseline_engine)
+    assert "enrichment_status" in {column["name"] for column in inspector.get_columns("posts")}
+    [foreign_key] = inspector.get_foreign_keys("posts")
+    assert foreign_key["referred_table"] == "users"
+    assert foreign_key["options"]["ondelete"] == "CASCADE"
+    assert {"ix_posts_date_created_pid", "ix_posts_user_id_date_created_id"} \
+        <= _index_names(baseline_engine, "posts")
+    assert {"ix_users_username_lower", "ix_users_email_lower"} \
+        <= _index_names(baseline_engine, "users")
+    with baseline_engine.connect() as conn:
+        # Posts of deleted users are kept
+        assert conn.execute(text("SELECT pid FROM posts ORDER BY id")).scalars().all() \
+            == ["p1", "p2"]
+
+def test_upgraded_users_are_unique_regardless_of_case(baseline_engine):
+    upgrade_schema(baseline_engine)
+    with pytest.raises(IntegrityError), baseline_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (uid, username, email) VALUES ('u2', 'ALICE', 'a2@example.com')"
+        ))
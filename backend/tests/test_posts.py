@@ -0,0 +1,35 @@
+"""Feed and search behavior that the query-count tests do not check."""
+import pytest
+from sqlalchemy import text
+from backend.core.conditional import change_versions
+from backend.db import engine
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def orphan_post():
+    """A post whose author no longer exists, as databases from before cascading deletes have."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.execute(text(
+            "INSERT INTO posts (pid, user_id, text) VALUES ('orphan', 999999, 'orphaned words')"
+        ))
+        conn.commit()
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+    await change_versions.bump("posts")
+    yield "orphan"
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM posts WHERE pid = 'orphan'"))
+    await change_versions.bump("posts")
+
+async def test_feed_keeps_posts_of_deleted_authors(client, orphan_post):
+    response = await client.get("/posts/", params={"include_author": True})
+    assert response.status_code == 200, response.text
+    [post] = [post for post in response.json()["items"] if post["pid"] == orphan_post]
+    assert post["author"] is None
+
+async def test_search_keeps_posts_of_deleted_authors(client, orphan_post):
+    response = await client.get("/posts/search", params={"q": "orphaned", "include_author": True})
+    assert response.status_code == 200, response.text
+    assert [(post["pid"], post["author"]) for post in response.json()["items"]] \
+        == [(orphan_post, None)]
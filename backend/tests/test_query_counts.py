@@ -0,0 +1,107 @@
+"""
+Statement budgets of the API endpoints. Each test counts the SQL statements
+one request sends to the database, so a change that adds a round trip (a
+lazy load, a separate existence check) fails here.
+"""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "password1"
+
+async def _count(query_counter, request):
+    with query_counter.count():
+        response = await request
+    return response, len(query_counter.statements)
+
+@pytest.fixture(scope="module")
+async def alice(client):
+    """A user with two posts, and the headers of an authenticated request."""
+    response = await client.post("/users/", json={
+        "username": "alice", "email": "alice@example.com", "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    user = response.json()
+    response = await client.post("/auth/login", json={"username": "alice", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for text in ("first post", "second post"):
+        response = await client.post("/posts/", json={"text": text}, headers=headers)
+        assert response.status_code == 200, response.text
+    return {"user": user, "headers": headers}
+
+async def test_signup(client, query_counter):
+    response, used = await _count(query_counter, client.post("/users/", json={
+        "username": "bob", "email": "bob@example.com", "password": PASSWORD}))
+    assert response.status_code == 200, response.text
+    assert used <= 1, query_counter.report()
+
+async def test_signup_duplicate_ignores_case(client, query_counter, alice): # pylint: disable=W0613
+    response, used = await _count(query_counter, client.post("/users/", json={
+        "username": "ALICE", "email": "other@example.com", "password": PASSWORD}))
+    assert response.status_code == 400, response.text
+    assert used <= 1, query_counter.report()
+
+@pytest.mark.parametrize("login", ["Alice", "alice@example.com"])
+async def test_login(client, query_counter, alice, login): # pylint: disable=W0613
+    response, used = await _count(query_counter, client.post(
+        "/auth/login", json={"username": login, "password": PASSWORD}))
+    assert response.status_code == 200, response.text
+    assert used <= 1, query_counter.report()
+
+async def test_current_user(client, query_counter, alice):
+    response, used = await _count(query_counter, client.get("/users/me", headers=alice["headers"]))
+    assert response.status_code == 200, response.text
+    assert used <= 1, query_counter.report()
+
+async def test_create_post(client, query_counter, alice):
+    response, used = await _count(query_counter, client.post(
+        "/posts/", json={"text": "no link here"}, headers=alice["headers"]))
+    assert response.status_code == 200, response.text
+    assert used <= 2, query_counter.report()
+
+@pytest.mark.parametrize("include_author", [False, True])
+async def test_feed_page(client, query_counter, alice, include_author): # pylint: disable=W0613
+    params = {"include_author": include_author, "limit": 1}
+    first = await client.get("/posts/", params=params)
+    response, used = await _count(query_counter, client.get(
+        "/posts/", params={**params, "cursor": first.json()["next_cursor"]}))
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == 1
+    assert used <= 1, query_counter.report()
+
+async def test_search(client, query_counter, alice): # pylint: disable=W0613
+    response, used = await _count(query_counter, client.get(
+        "/posts/search", params={"q": "post", "include_author": True}))
+    assert response.status_code == 200, response.text
+    assert response.json()["items"]
+    assert used <= 1, query_counter.report()
+
+async def test_users(client, query_counter, alice): # pylint: disable=W0613
+    response, used = await _count(query_counter, client.get("/users/"))
+    assert response.status_code == 200, response.text
+    assert used <= 1, query_counter.report()
+
+async def test_users_batch(client, query_counter, alice):
+    response, used = await _count(query_counter, client.post(
+        "/users/batch", json=[alice["user"]["id"], 999]))
+    assert response.status_code == 200, response.text
+    assert [user["id"] for user in response.json()] == [alice["user"]["id"]]
+    assert used <= 1, query_counter.report()
+
+async def test_user(client, query_counter, alice):
+    response, used = await _count(query_counter, client.get(f"/users/{alice['user']['id']}"))
+    assert response.status_code == 200, response.text
+    assert used <= 1, query_counter.report()
+
+async def test_user_posts(client, query_counter, alice):
+    response, used = await _count(query_counter, client.get(
+        f"/users/{alice['user']['id']}/posts"))
+    assert response.status_code == 200, response.text
+    assert response.json()["items"]
+    assert used <= 1, query_counter.report()
+
+async def test_not_modified_runs_no_query(client, query_counter, alice): # pylint: disable=W0613
+    etag = (await client.get("/users/")).headers["ETag"]
+    response, used = await _count(query_counter, client.get(
+        "/users/", headers={"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert used == 0, query_counter.report()
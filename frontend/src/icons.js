@@ -0,0 +1,13 @@
+// src/icons.js
+
+// Edge length, in pixels, of the icons the UI shows (avatars at 2x for HiDPI screens)
+export const ICON_DISPLAY_SIZE = 96;
+
+// Returns the URL of the smallest icon variant at least `size` pixels wide,
+// or of the largest one. The available sizes are the keys the API sends,
+// since the server's ICON_SIZES can be configured.
+export function iconVariantUrl(variants, size = ICON_DISPLAY_SIZE) {
+  const sizes = Object.keys(variants).map(Number).sort((a, b) => a - b);
+  const fitting = sizes.find((candidate) => candidate >= size);
+  return variants[String(fitting !== undefined ? fitting : sizes[sizes.length - 1])];
+}
@@ -2,6 +2,7 @@
 import { createStore } from 'vuex';
 import axios from 'axios';
 import apiClient from '@/apiClient';
+import { iconVariantUrl } from '@/icons';
 
 const store = createStore({
   namespaced: true,
@@ -120,6 +121,9 @@ const store = createStore({
     isAuthenticated: (state) => state.authStatus === 'authenticated',
     getUser: (state) => state.user,
     userIconUrl: (state) => {
+      if (state.user && state.user.icon_variants) {
+        return `${process.env.VUE_APP_API_BASE_URL}${iconVariantUrl(state.user.icon_variants)}`;
+      }
       if (state.user && state.user.icon) {
         return `${process.env.VUE_APP_API_BASE_URL}/icons/${state.user.icon}`;
       }